@@ -1,19 +1,36 @@
 import dash
-from dash import dcc, html, Input, Output, State, callback, callback_context
+from dash import dcc, html, Input, Output, State, ALL, ClientsideFunction, callback, callback_context
 import dash_bootstrap_components as dbc
+import flask
 from dash.exceptions import PreventUpdate
-import base64
 import io
-import tempfile
 import os
 import json
-import google.generativeai as genai
+import importlib
 from datetime import datetime
-import PyPDF2
-import requests
-from bs4 import BeautifulSoup
 import re
 import urllib.parse
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from cache import LRUCache, SQLiteCache, TieredCache, make_cache_key
+from job_queue import JobQueue, QueueFullError, DONE, FAILED, CANCELLED, QUEUED, RUNNING
+from batch import iter_batch, parse_sources, results_to_zip
+from http_client import HttpClient, canonicalize_url
+from html_extract import get_backend
+from pdf_extract import (MAX_PDF_BYTES, MAX_PDF_PAGES, count_pdf_pages, decode_data_url, extract_pdf_pages,
+                         extract_upload_pages)
+from text_normalize import normalize_pages
+from uploads import UploadStore, UploadTooLargeError, register_upload_route
+from llm_clients import GeminiClientPool
+from rate_limit import GenerationResult, LLMGuard
+from model_router import GeminiBackend, ModelRouter, StubBackend, load_routes
+from prompt_budget import PromptBudget, estimate_tokens
+from revision import plan_revision, splice
+from session_store import SessionStore, open_backend
+from metrics import REGISTRY, STAGE_SECONDS, CONTENT_TYPE as METRICS_CONTENT_TYPE, CallbackCounter, Gauge
 
 # Initialize the Dash app with a bootstrap theme
 app = dash.Dash(
@@ -25,6 +42,170 @@ app = dash.Dash(
 server = app.server
 app.title = "AI Cover Letter Generator"
 
+GEMINI_MODEL = "gemini-2.5-pro-exp-03-25"
+# Flash-class model for short letters, and the first fallback for GEMINI_MODEL
+GEMINI_FAST_MODEL = os.environ.get("CLG_FAST_MODEL", "gemini-2.0-flash")
+
+# One configured client per (API key, model), so users' keys never share SDK state
+gemini_clients = GeminiClientPool(max_clients=int(os.environ.get("CLG_GEMINI_MAX_CLIENTS", "32")))
+
+# Per-key token buckets, per-model concurrency caps, backoff on 429/5xx and a circuit breaker
+LLM_MAX_CONCURRENCY = int(os.environ.get("CLG_LLM_MAX_CONCURRENCY", "8"))
+llm_guard = LLMGuard(
+    rate_per_minute=int(os.environ.get("CLG_LLM_RATE_PER_MIN", "30")),
+    burst=int(os.environ.get("CLG_LLM_BURST", "5")),
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    max_retries=int(os.environ.get("CLG_LLM_MAX_RETRIES", "4")),
+)
+
+# Model chains per letter length, as "<backend>:<model>" specs. Override with CLG_MODEL_ROUTES
+# (JSON), e.g. '{"default": ["stub:offline"]}' to run without network access or an API key.
+# CLG_HEDGE_AFTER (seconds) also sends slow requests to the next model and keeps the first answer.
+MODEL_ROUTES = load_routes(os.environ.get("CLG_MODEL_ROUTES"), {
+    "default": [f"gemini:{GEMINI_MODEL}", f"gemini:{GEMINI_FAST_MODEL}"],
+    "concise": [f"gemini:{GEMINI_FAST_MODEL}", f"gemini:{GEMINI_MODEL}"],
+    # Single-paragraph revisions (see revision.py)
+    "revision": [f"gemini:{GEMINI_FAST_MODEL}", f"gemini:{GEMINI_MODEL}"],
+})
+
+# Room for every call the guard admits per model, and as many again for timed-out or losing-hedge
+# calls that are abandoned but still waiting on the SDK (it has no request timeout to cut them off)
+ROUTER_WORKERS = int(os.environ.get("CLG_ROUTER_WORKERS", str(
+    2 * LLM_MAX_CONCURRENCY * len({spec for chain in MODEL_ROUTES.values() for spec in chain}))))
+
+model_router = ModelRouter(
+    {
+        "gemini": GeminiBackend(gemini_clients),
+        "stub": StubBackend(
+            latency=float(os.environ.get("CLG_STUB_LATENCY", "0.5")),
+            chunk_delay=float(os.environ.get("CLG_STUB_CHUNK_DELAY", "0.05")),
+        ),
+    },
+    MODEL_ROUTES,
+    guard=llm_guard,
+    timeout=float(os.environ.get("CLG_MODEL_TIMEOUT", "120")),
+    hedge_after=float(os.environ["CLG_HEDGE_AFTER"]) if os.environ.get("CLG_HEDGE_AFTER") else None,
+    max_workers=ROUTER_WORKERS,
+    # A streaming answer that goes quiet for this long fails instead of hanging its job
+    idle_timeout=float(os.environ.get("CLG_MODEL_IDLE_TIMEOUT", "60")),
+)
+
+# Scraped job descriptions are stripped of page chrome and trimmed to this many (estimated) tokens
+prompt_budget = PromptBudget(max_tokens=int(os.environ.get("CLG_JD_TOKEN_BUDGET", "1500")))
+
+# Generated letters are cached by their inputs so repeated clicks skip the LLM call.
+# Set CLG_RESULT_CACHE_PATH to also persist results in a SQLite file.
+RESULT_CACHE_SIZE = int(os.environ.get("CLG_RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_PATH = os.environ.get("CLG_RESULT_CACHE_PATH")
+RESULT_CACHE_TTL = int(os.environ.get("CLG_RESULT_CACHE_TTL", "86400"))
+RESULT_CACHE_MAX_ROWS = int(os.environ.get("CLG_RESULT_CACHE_MAX_ROWS", "10000"))
+
+result_cache = TieredCache(
+    LRUCache(max_entries=RESULT_CACHE_SIZE),
+    SQLiteCache(RESULT_CACHE_PATH, ttl=RESULT_CACHE_TTL, max_entries=RESULT_CACHE_MAX_ROWS)
+    if RESULT_CACHE_PATH else None,
+)
+
+# Generations run on a bounded worker pool instead of inside the HTTP request.
+# CLG_JOB_EXECUTOR=process trades streaming output for process isolation.
+JOB_WORKERS = int(os.environ.get("CLG_JOB_WORKERS", "4"))
+JOB_MAX_PENDING = int(os.environ.get("CLG_JOB_MAX_PENDING", "32"))
+JOB_EXECUTOR = os.environ.get("CLG_JOB_EXECUTOR", "thread")
+
+job_queue = JobQueue(max_workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING, executor=JOB_EXECUTOR)
+
+# One pooled keep-alive client serves every job posting import
+http_client = HttpClient(
+    pool_maxsize=int(os.environ.get("CLG_HTTP_POOL_SIZE", "16")),
+    per_host_limit=int(os.environ.get("CLG_HTTP_PER_HOST", "4")),
+    validator_cache_bytes=int(os.environ.get("CLG_HTTP_REVALIDATE_BYTES", str(32 * 1024 * 1024))),
+)
+
+# Fastest installed HTML parser (selectolax > lxml > html.parser) unless CLG_HTML_BACKEND names one
+html_backend = get_backend(os.environ.get("CLG_HTML_BACKEND"))
+
+# Imported postings (extracted text) keyed by canonical URL; the raw HTML is only
+# kept by http_client, for revalidating the page once this entry expires.
+# Set CLG_POSTING_CACHE_PATH to keep them on disk across restarts.
+POSTING_CACHE_TTL = int(os.environ.get("CLG_POSTING_CACHE_TTL", "21600"))
+POSTING_CACHE_BYTES = int(os.environ.get("CLG_POSTING_CACHE_BYTES", str(32 * 1024 * 1024)))
+POSTING_CACHE_PATH = os.environ.get("CLG_POSTING_CACHE_PATH")
+POSTING_CACHE_DISK_BYTES = int(os.environ.get("CLG_POSTING_CACHE_DISK_BYTES", str(256 * 1024 * 1024)))
+
+posting_cache = TieredCache(
+    LRUCache(max_entries=1024, ttl=POSTING_CACHE_TTL, max_bytes=POSTING_CACHE_BYTES),
+    SQLiteCache(POSTING_CACHE_PATH, ttl=POSTING_CACHE_TTL, max_entries=100000, max_bytes=POSTING_CACHE_DISK_BYTES)
+    if POSTING_CACHE_PATH else None,
+)
+
+# Files are streamed to /upload and callbacks receive a handle instead of a base64 data URL.
+# CLG_UPLOAD_MAX_BYTES / CLG_UPLOAD_MAX_PAGES are read by pdf_extract, so uploads and parsing share one limit
+UPLOAD_MAX_BYTES = MAX_PDF_BYTES
+UPLOAD_MAX_PAGES = MAX_PDF_PAGES
+
+upload_store = UploadStore(max_bytes=UPLOAD_MAX_BYTES, directory=os.environ.get("CLG_UPLOAD_DIR"))
+
+# Batch runs fan out inside a single job; these bound the fan-out per batch
+BATCH_CONCURRENCY = int(os.environ.get("CLG_BATCH_CONCURRENCY", "4"))
+BATCH_RPM = int(os.environ.get("CLG_BATCH_RPM", "0")) or None
+BATCH_MAX_SOURCES = int(os.environ.get("CLG_BATCH_MAX_SOURCES", "100"))
+
+# Per-session data (API key, extracted PDF text, revision history) stays on the server and
+# callbacks pass only the session id. CLG_SESSION_STORE is memory, sqlite:///<path> or redis://<host>.
+session_store = SessionStore(open_backend(
+    os.environ.get("CLG_SESSION_STORE"),
+    ttl=int(os.environ.get("CLG_SESSION_TTL", "3600")),
+    max_entries=int(os.environ.get("CLG_SESSION_MAX_ENTRIES", "10000")),
+    max_bytes=int(os.environ.get("CLG_SESSION_MAX_BYTES", str(64 * 1024 * 1024))),
+))
+
+# The Gemini SDK, PyPDF2, requests and the HTML parser load on first use, which keeps worker
+# boot fast. prewarm() imports them up front; CLG_PREWARM=1 does that at import time.
+LAZY_MODULES = ("google.generativeai", "PyPDF2", "requests")
+
+def prewarm():
+    """Import the lazily loaded dependencies now, e.g. in a preloading server before it forks workers."""
+    for name in LAZY_MODULES:
+        importlib.import_module(name)
+    html_backend.extract("<html><body><main>warm-up</main></body></html>")
+
+def after_fork():
+    """Give a worker forked from a preloaded parent its own SQLite connections."""
+    for store in (result_cache.disk, posting_cache.disk, session_store.backend):
+        if isinstance(store, SQLiteCache):
+            store.reopen()
+
+if os.environ.get("CLG_PREWARM") == "1":
+    prewarm()
+
+# Paragraphs a revision sends to the model at once
+REVISION_CONCURRENCY = int(os.environ.get("CLG_REVISION_CONCURRENCY", "4"))
+
+# Compare mode runs every tone/length/focus combination inside one job, on a pool
+# of CLG_VARIANT_CONCURRENCY threads per comparison (like a batch run's fan-out)
+MAX_VARIANTS = int(os.environ.get("CLG_MAX_VARIANTS", "6"))
+VARIANT_CONCURRENCY = int(os.environ.get("CLG_VARIANT_CONCURRENCY", str(MAX_VARIANTS)))
+
+# Generation setting choices, shared by the main and compare-variant controls
+TONE_OPTIONS = [
+    {"label": "Professional", "value": "professional"},
+    {"label": "Enthusiastic", "value": "enthusiastic"},
+    {"label": "Confident", "value": "confident"},
+    {"label": "Friendly", "value": "friendly"},
+    {"label": "Formal", "value": "formal"},
+]
+LENGTH_OPTIONS = [
+    {"label": "Concise", "value": "concise"},
+    {"label": "Moderate", "value": "moderate"},
+    {"label": "Detailed", "value": "detailed"},
+]
+FOCUS_OPTIONS = [
+    {"label": "Skills Match", "value": "skills"},
+    {"label": "Experience", "value": "experience"},
+    {"label": "Culture Fit", "value": "culture"},
+    {"label": "Balanced", "value": "balanced"},
+]
+
 # Define card styles
 card_style = {
     "borderRadius": "15px",
@@ -47,7 +228,7 @@ input_style = {
 }
 
 # Layout
-app.layout = dbc.Container(
+layout = dbc.Container(
     [
         # Header
         dbc.Row(
@@ -171,6 +352,51 @@ app.layout = dbc.Container(
                                                         html.Div(id="url-extraction-status", className="mt-2"),
                                                     ],
                                                 ),
+                                                dcc.Tab(
+                                                    label="Batch",
+                                                    value="batch-tab",
+                                                    children=[
+                                                        dcc.Textarea(
+                                                            id="batch-sources",
+                                                            placeholder="One job URL per line, or job descriptions separated by a line containing ---",
+                                                            style={
+                                                                "width": "100%",
+                                                                "height": "200px",
+                                                                "borderRadius": "8px",
+                                                                "padding": "10px",
+                                                                "marginTop": "10px",
+                                                            },
+                                                        ),
+                                                        dbc.Row(
+                                                            [
+                                                                dbc.Col(
+                                                                    dbc.Button(
+                                                                        [html.I(className="fas fa-layer-group me-2"), "Run Batch"],
+                                                                        id="batch-run-btn",
+                                                                        color="primary",
+                                                                        className="w-100",
+                                                                        style=button_style,
+                                                                    ),
+                                                                    md=6,
+                                                                ),
+                                                                dbc.Col(
+                                                                    dbc.Button(
+                                                                        [html.I(className="fas fa-file-archive me-2"), "Download ZIP"],
+                                                                        id="batch-download-btn",
+                                                                        color="success",
+                                                                        className="w-100",
+                                                                        style=button_style,
+                                                                        disabled=True,
+                                                                    ),
+                                                                    md=6,
+                                                                ),
+                                                            ],
+                                                            className="mt-3",
+                                                        ),
+                                                        html.Div(id="batch-status", className="mt-2"),
+                                                        dcc.Download(id="batch-download"),
+                                                    ],
+                                                ),
                                             ],
                                         ),
                                         dbc.Button(
@@ -250,6 +476,7 @@ app.layout = dbc.Container(
                                                                 "marginTop": "10px",
                                                             },
                                                             multiple=False,
+                                                            max_size=UPLOAD_MAX_BYTES,
                                                         ),
                                                         html.Div(id="pdf-upload-status", className="mt-3"),
                                                     ],
@@ -296,13 +523,7 @@ app.layout = dbc.Container(
                                                     html.Label("Tone:"),
                                                     dcc.Dropdown(
                                                         id="tone-dropdown",
-                                                        options=[
-                                                            {"label": "Professional", "value": "professional"},
-                                                            {"label": "Enthusiastic", "value": "enthusiastic"},
-                                                            {"label": "Confident", "value": "confident"},
-                                                            {"label": "Friendly", "value": "friendly"},
-                                                            {"label": "Formal", "value": "formal"},
-                                                        ],
+                                                        options=TONE_OPTIONS,
                                                         value="professional",
                                                         clearable=False,
                                                         style={"borderRadius": "8px"},
@@ -315,11 +536,7 @@ app.layout = dbc.Container(
                                                     html.Label("Length:"),
                                                     dcc.Dropdown(
                                                         id="length-dropdown",
-                                                        options=[
-                                                            {"label": "Concise", "value": "concise"},
-                                                            {"label": "Moderate", "value": "moderate"},
-                                                            {"label": "Detailed", "value": "detailed"},
-                                                        ],
+                                                        options=LENGTH_OPTIONS,
                                                         value="moderate",
                                                         clearable=False,
                                                         style={"borderRadius": "8px"},
@@ -332,12 +549,7 @@ app.layout = dbc.Container(
                                                     html.Label("Focus:"),
                                                     dcc.Dropdown(
                                                         id="focus-dropdown",
-                                                        options=[
-                                                            {"label": "Skills Match", "value": "skills"},
-                                                            {"label": "Experience", "value": "experience"},
-                                                            {"label": "Culture Fit", "value": "culture"},
-                                                            {"label": "Balanced", "value": "balanced"},
-                                                        ],
+                                                        options=FOCUS_OPTIONS,
                                                         value="balanced",
                                                         clearable=False,
                                                         style={"borderRadius": "8px"},
@@ -363,6 +575,59 @@ app.layout = dbc.Container(
                                             ),
                                         ]
                                     ),
+                                    html.Hr(),
+                                    html.H6("Compare Variants", className="text-primary fw-bold"),
+                                    html.P(
+                                        f"Pick several settings to generate every combination (up to {MAX_VARIANTS}) at once.",
+                                        className="text-muted small",
+                                    ),
+                                    dbc.Row(
+                                        [
+                                            dbc.Col(
+                                                dcc.Dropdown(
+                                                    id="variant-tones",
+                                                    options=TONE_OPTIONS,
+                                                    multi=True,
+                                                    placeholder="Tones",
+                                                ),
+                                                md=4,
+                                            ),
+                                            dbc.Col(
+                                                dcc.Dropdown(
+                                                    id="variant-lengths",
+                                                    options=LENGTH_OPTIONS,
+                                                    multi=True,
+                                                    placeholder="Lengths",
+                                                ),
+                                                md=4,
+                                            ),
+                                            dbc.Col(
+                                                dcc.Dropdown(
+                                                    id="variant-focuses",
+                                                    options=FOCUS_OPTIONS,
+                                                    multi=True,
+                                                    placeholder="Focuses",
+                                                ),
+                                                md=4,
+                                            ),
+                                        ],
+                                        className="mb-3",
+                                    ),
+                                    dbc.Row(
+                                        [
+                                            dbc.Col(
+                                                dbc.Button(
+                                                    [html.I(className="fas fa-columns me-2"), "Compare Variants"],
+                                                    id="variant-btn",
+                                                    color="secondary",
+                                                    className="w-100",
+                                                    style=button_style,
+                                                ),
+                                                md=4,
+                                            ),
+                                            dbc.Col(html.Div(id="variant-status", className="mt-2"), md=8),
+                                        ]
+                                    ),
                                 ]
                             ),
                         ],
@@ -381,6 +646,13 @@ app.layout = dbc.Container(
                         [
                             dbc.Spinner(color="primary", size="lg"),
                             html.P("Generating your personalized cover letter...", className="text-center text-muted mt-2"),
+                            dbc.Button(
+                                "Cancel",
+                                id="cancel-generation-btn",
+                                color="link",
+                                size="sm",
+                                className="text-muted",
+                            ),
                         ],
                         id="loading-indicator",
                         style={"display": "none", "textAlign": "center", "paddingTop": "20px", "paddingBottom": "20px"},
@@ -441,6 +713,16 @@ app.layout = dbc.Container(
                                                 ),
                                                 width="auto",
                                             ),
+                                            dbc.Col(
+                                                dbc.Button(
+                                                    [html.I(className="fas fa-pen me-2"), "Revise Changes"],
+                                                    id="revise-btn",
+                                                    color="secondary",
+                                                    className="me-2",
+                                                    style=button_style,
+                                                ),
+                                                width="auto",
+                                            ),
                                             dbc.Col(
                                                 html.Div(id="copy-status", className="text-success"),
                                                 width="auto",
@@ -463,6 +745,25 @@ app.layout = dbc.Container(
             style={"display": "none"},
         ),
         
+        # Variant comparison
+        dbc.Row(
+            [
+                dbc.Col(
+                    dbc.Card(
+                        [
+                            dbc.CardHeader("Variant Comparison", className="text-primary fw-bold"),
+                            dbc.CardBody(dbc.Row(id="variant-results")),
+                        ],
+                        style=card_style,
+                        className="mb-4 mt-3",
+                    ),
+                    width=12,
+                ),
+            ],
+            id="variant-row",
+            style={"display": "none"},
+        ),
+        
         # Footer
         dbc.Row(
             [
@@ -482,38 +783,38 @@ app.layout = dbc.Container(
         ),
         
         # Store components for data
-        dcc.Store(id="api-key-store"),
         dcc.Store(id="temp-files"),
         dcc.Store(id="extracted-cover-letter"),
+        dcc.Store(id="pdf-upload-handle"),
+        dcc.Store(id="generation-job"),
+        dcc.Interval(id="generation-poll", interval=500, disabled=True),
+        dcc.Store(id="batch-job"),
+        dcc.Interval(id="batch-poll", interval=1000, disabled=True),
+        dcc.Store(id="variant-jobs"),
+        dcc.Interval(id="variant-poll", interval=500, disabled=True),
     ],
     fluid=True,
     style={"backgroundColor": "#f8f9fa", "minHeight": "100vh", "padding": "20px"},
 )
 
+def serve_layout():
+    """The static layout plus a fresh session id for each page load."""
+    return html.Div([layout, dcc.Store(id="session-id", data=SessionStore.new_id())])
+
+app.layout = serve_layout
+
 # Helper functions
 def parse_file_contents(contents, filename):
-    content_type, content_string = contents.split(",")
-    decoded = base64.b64decode(content_string)
-    
     try:
         if filename.endswith(".pdf"):
-            # Create a temporary file to save the PDF
-            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
-                temp_file.write(decoded)
-                temp_path = temp_file.name
-            
-            # Extract text from PDF
-            text = ""
-            with open(temp_path, "rb") as f:
-                pdf_reader = PyPDF2.PdfReader(f)
-                for page_num in range(len(pdf_reader.pages)):
-                    text += pdf_reader.pages[page_num].extract_text()
-            
-            # Clean up the temporary file
-            os.unlink(temp_path)
-            return text
-            
-        elif filename.endswith(".txt") or filename.endswith(".md") or filename.endswith(".rtf"):
+            # Extract text from PDF (parsed in memory and shared with the other upload callbacks)
+            with STAGE_SECONDS.time(stage="pdf_parse"):
+                return "".join(extract_pdf_pages(contents))
+        
+        with STAGE_SECONDS.time(stage="upload_decode"):
+            decoded = decode_data_url(contents)
+        
+        if filename.endswith(".txt") or filename.endswith(".md") or filename.endswith(".rtf"):
             return decoded.decode("utf-8")
         
         elif filename.endswith(".docx"):
@@ -529,101 +830,85 @@ def parse_file_contents(contents, filename):
 
 def extract_pdf_text(contents, filename):
     """Extract text specifically from PDF, with better formatting preservation."""
-    content_type, content_string = contents.split(",")
-    decoded = base64.b64decode(content_string)
-    
     try:
         if filename.endswith(".pdf"):
-            # Create a temporary file to save the PDF
-            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
-                temp_file.write(decoded)
-                temp_path = temp_file.name
-            
             # Extract text from PDF with better formatting
-            text = ""
-            with open(temp_path, "rb") as f:
-                pdf_reader = PyPDF2.PdfReader(f)
-                for page_num in range(len(pdf_reader.pages)):
-                    page_text = pdf_reader.pages[page_num].extract_text()
-                    # Clean up common PDF extraction issues
-                    page_text = re.sub(r'\s+', ' ', page_text)  # Replace multiple spaces with single space
-                    text += page_text + "\n\n"  # Add paragraph breaks between pages
-            
-            # Clean up the temporary file
-            os.unlink(temp_path)
-            
-            # Additional PDF text cleanup
-            text = text.strip()
-            # Remove header/footer numbers or emails that might appear on every page
-            text = re.sub(r'\n\s*\d+\s*\n', '\n', text)
-            text = re.sub(r'\n\s*Page \d+ of \d+\s*\n', '\n', text)
-            # Join hyphenated words that were split across lines
-            text = re.sub(r'(\w+)-\n(\w+)', r'\1\2', text)
-            
-            return text
+            with STAGE_SECONDS.time(stage="pdf_parse"):
+                return normalize_pages(extract_pdf_pages(contents))
         else:
             return "Please upload a PDF file."
     
     except Exception as e:
         return f"Error processing PDF: {str(e)}"
 
+def extract_uploaded_pdf_text(handle, session_id):
+    """Extract text from a PDF this session streamed to /upload; the upload is discarded afterwards."""
+    upload = upload_store.take(handle, session_id)
+    if upload is None:
+        return "Upload expired. Please upload the PDF again."
+    
+    try:
+        if upload.filename.lower().endswith(".pdf"):
+            with STAGE_SECONDS.time(stage="pdf_parse"):
+                return normalize_pages(extract_upload_pages(upload))
+        else:
+            return "Please upload a PDF file."
+    
+    except Exception as e:
+        return f"Error processing PDF: {str(e)}"
+    finally:
+        upload.close()
+
+def _validate_upload(upload):
+    """Reject PDFs over the page limit before any text is extracted."""
+    if not upload.filename.lower().endswith(".pdf"):
+        return
+    try:
+        # Reads the page tree from the spooled file, without loading the whole upload
+        with upload.open() as f:
+            pages = count_pdf_pages(f)
+    except Exception:
+        raise ValueError("Could not read this file as a PDF.")
+    if pages > UPLOAD_MAX_PAGES:
+        raise UploadTooLargeError(f"PDF has {pages} pages; the limit is {UPLOAD_MAX_PAGES}.")
+
+# Same prefix as Dash's own routes, which the browser reaches through requests_pathname_prefix
+register_upload_route(server, upload_store, validate=_validate_upload, prefix=app.config.routes_pathname_prefix)
+
 def extract_job_description_from_url(url):
     """Extract job description content from a URL."""
+    import requests  # Loaded with the first import (see LAZY_MODULES)
+    
     try:
         # Validate URL
         parsed_url = urllib.parse.urlparse(url)
         if not parsed_url.scheme or not parsed_url.netloc:
             return None, "Invalid URL. Please provide a complete URL including http:// or https://"
         
-        # Set headers to mimic a browser request
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.110 Safari/537.36',
-        }
+        # Serve repeat imports of the same posting without fetching or parsing
+        cache_key = canonicalize_url(url)
+        cached = posting_cache.get(cache_key)
+        if cached is not None:
+            return cached["text"], "Job description extracted successfully!"
         
-        # Fetch the webpage
-        response = requests.get(url, headers=headers, timeout=10)
+        # Fetch the webpage over the shared session (browser User-Agent, keep-alive, revalidation)
+        with STAGE_SECONDS.time(stage="url_fetch"):
+            response = http_client.get(url, timeout=10)
         if response.status_code != 200:
             return None, f"Failed to access the URL. Status code: {response.status_code}"
         
-        # Parse HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.extract()
-        
-        # Different extraction strategies based on common job board structures
-        job_description = ""
-        
-        # Try to find job description container (common patterns across job sites)
-        job_containers = soup.find_all(['div', 'section'], class_=lambda c: c and any(term in str(c).lower() for term in 
-                                                              ['job-description', 'description', 'details', 'jobDesc', 'job_des', 
-                                                               'jobdetail', 'job-details']))
-        
-        if job_containers:
-            # Use the first matching container
-            job_description = job_containers[0].get_text(separator=' ', strip=True)
-        else:
-            # Fallback: use the main content area
-            main_content = soup.find(['main', 'article']) or soup.find('div', {'id': 'content'})
-            if main_content:
-                job_description = main_content.get_text(separator=' ', strip=True)
-            else:
-                # Last resort: grab the body text but try to exclude headers, footers
-                body = soup.find('body')
-                if body:
-                    # Skip likely header/nav/footer elements
-                    for element in body.find_all(['header', 'nav', 'footer']):
-                        element.extract()
-                    job_description = body.get_text(separator=' ', strip=True)
-        
-        # Clean up the extracted text
-        job_description = re.sub(r'\s+', ' ', job_description)  # Replace multiple spaces/newlines
+        # Pull the job description out with the configured parser backend
+        with STAGE_SECONDS.time(stage="html_parse"):
+            job_description = html_backend.extract(response.text)
+            
+            # Clean up the extracted text
+            job_description = re.sub(r'\s+', ' ', job_description)  # Replace multiple spaces/newlines
         
         # If extraction failed or content too short, return error
         if not job_description or len(job_description) < 100:
             return None, "Could not extract job description from the provided URL. The site may block automated extraction."
         
+        posting_cache.set(cache_key, {"url": url, "text": job_description})
         return job_description, "Job description extracted successfully!"
     
     except requests.exceptions.Timeout:
@@ -633,16 +918,9 @@ def extract_job_description_from_url(url):
     except Exception as e:
         return None, f"Error extracting job description: {str(e)}"
 
-def generate_adapted_cover_letter(job_description, original_letter, api_key, tone, length, focus):
-    # Configure Google AI with the API key
-    try:
-        genai.configure(api_key=api_key)
-        
-        # Set up the model
-        model = genai.GenerativeModel('gemini-2.5-pro-exp-03-25')
-        
-        # Create the prompt
-        prompt = f"""
+def build_cover_letter_prompt(job_description, original_letter, tone, length, focus):
+    """Build the Gemini prompt used to adapt a cover letter to a job description."""
+    return f"""
         You are a professional cover letter writer. Your task is to adapt an existing cover letter to match a specific job description.
         
         Tone: {tone}
@@ -666,28 +944,354 @@ def generate_adapted_cover_letter(job_description, original_letter, api_key, ton
         
         Format the response as a proper cover letter without any explanations or additional text.
         """
-        
-        # Generate the adapted cover letter
-        response = model.generate_content(prompt)
-        return response.text
+
+def build_budgeted_prompt(job_description, original_letter, tone, length, focus):
+    """Compact the job description to the token budget, then build the prompt; returns (prompt, report)."""
+    with STAGE_SECONDS.time(stage="prompt_build"):
+        job_description, report = prompt_budget.compact(job_description)
+        return build_cover_letter_prompt(job_description, original_letter, tone, length, focus), report
+
+def _normalize_text(text):
+    return re.sub(r'\s+', ' ', text or "").strip()
+
+def cover_letter_cache_key(job_description, original_letter, tone, length, focus, model_name=None):
+    """Content-addressed cache key for a generation request."""
+    if model_name is None:
+        # Keyed by the route's primary model; a fallback answer is cached for the route
+        model_name = model_router.primary_model(length)
+    return make_cache_key(
+        _normalize_text(job_description),
+        _normalize_text(original_letter),
+        tone,
+        length,
+        focus,
+        model_name,
+    )
+
+def generate_adapted_cover_letter(job_description, original_letter, api_key, tone, length, focus):
+    """Generate a tailored letter and return a GenerationResult (text or structured error)."""
+    cache_key = cover_letter_cache_key(job_description, original_letter, tone, length, focus)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return GenerationResult(text=cached, cached=True)
+    
+    # Create the prompt from a compacted job description
+    prompt, compaction = build_budgeted_prompt(job_description, original_letter, tone, length, focus)
     
+    # Generate the adapted cover letter (routed by length, rate limited, falls back on 429/5xx/timeouts)
+    try:
+        text, model = model_router.generate(api_key, prompt, length)
     except Exception as e:
-        return f"Error generating cover letter: {str(e)}"
+        result = GenerationResult.failure(e)
+        result.compaction = compaction
+        return result
+    
+    result_cache.set(cache_key, text)
+    return GenerationResult(text=text, model=model, compaction=compaction)
+
+def stream_adapted_cover_letter(job_description, original_letter, api_key, tone, length, focus):
+    """Yield the adapted cover letter in chunks as the model produces them; failures raise LLMError."""
+    prompt, _ = build_budgeted_prompt(job_description, original_letter, tone, length, focus)
+    yield from model_router.stream(api_key, prompt, length)
+
+def _generation_job(job_description, original_letter, api_key, tone, length, focus):
+    """Stream a generation through the result cache; runs on the job queue."""
+    cache_key = cover_letter_cache_key(job_description, original_letter, tone, length, focus)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+    
+    chunks = []
+    for text in stream_adapted_cover_letter(job_description, original_letter, api_key, tone, length, focus):
+        chunks.append(text)
+        yield text
+    result_cache.set(cache_key, "".join(chunks))
+
+def _generation_text(*args):
+    result = generate_adapted_cover_letter(*args)
+    if not result.ok:
+        raise RuntimeError(result.error)
+    return result.text
+
+def submit_generation(job_description, original_letter, api_key, tone, length, focus):
+    """Queue a generation and return its Job; raises QueueFullError when saturated."""
+    args = (job_description, original_letter, api_key, tone, length, focus)
+    if job_queue.executor_kind == "process":
+        # Generators can't cross the process boundary, so process workers return whole letters
+        return job_queue.submit(_generation_text, *args)
+    return job_queue.submit(_generation_job, *args)
+
+def revise_paragraphs(paragraphs, targets, api_key):
+    """Revise the target paragraphs, REVISION_CONCURRENCY at a time, and return the spliced letter."""
+    with ThreadPoolExecutor(max_workers=min(REVISION_CONCURRENCY, len(targets)),
+                            thread_name_prefix="revise") as pool:
+        futures = {
+            t["index"]: pool.submit(model_router.generate, api_key, t["prompt"], "revision")
+            for t in targets
+        }
+        revised = {index: future.result()[0] for index, future in futures.items()}
+    return splice(paragraphs, revised)
+
+def start_revision_session(session_id, job, job_description, original_letter, tone, length, focus, report=None):
+    """Record a queued generation or revision; it becomes the session's letter once it finishes."""
+    session = session_store.get(session_id, "revision") or {}
+    pending = {
+        "job_id": job.id,
+        "inputs": {"job_description": job_description, "original_letter": original_letter,
+                   "tone": tone, "length": length, "focus": focus},
+        "report": report,
+    }
+    session_store.set(session_id, "revision", {**session, "pending": pending})
+
+def settle_revision_session(session_id):
+    """Fold a finished pending job into its session and return the session (or None)."""
+    session = session_store.get(session_id, "revision")
+    if not session or not session.get("pending"):
+        return session
+    job = job_queue.get(session["pending"]["job_id"])
+    if job is not None and not job.done:
+        return session
+    if job is not None and job.status == DONE:
+        session = {**session["pending"]["inputs"], "letter": job.text, "pending": None,
+                   "report": session["pending"]["report"]}
+    else:
+        session = {**session, "pending": None}
+    session_store.set(session_id, "revision", session)
+    return session
+
+def _option_label(options, value):
+    return next((o["label"] for o in options if o["value"] == value), value)
+
+def _variant_label(variant):
+    return " · ".join([
+        _option_label(TONE_OPTIONS, variant["tone"]),
+        _option_label(LENGTH_OPTIONS, variant["length"]),
+        _option_label(FOCUS_OPTIONS, variant["focus"]),
+    ])
+
+def variant_combinations(tones, lengths, focuses, tone, length, focus):
+    """Every (tone, length, focus) combination of the picks; an empty pick uses the main setting."""
+    return list(itertools.product(tones or [tone], lengths or [length], focuses or [focus]))
+
+def _variants_job(job_description, original_letter, api_key, variants):
+    """Generate every variant on the comparison's own pool, yielding one JSON line per event.
+
+    Events carry the variant's ``index`` plus a ``text`` chunk or its new
+    ``status``; _variant_snapshots rebuilds the cards from them.
+    """
+    events = queue.Queue()
+    stop = threading.Event()
+
+    def run(index, tone, length, focus):
+        started = time.time()
+        events.put({"index": index, "status": RUNNING})
+        try:
+            for text in _generation_job(job_description, original_letter, api_key, tone, length, focus):
+                if stop.is_set():
+                    return
+                events.put({"index": index, "text": text})
+            events.put({"index": index, "status": DONE, "run_seconds": time.time() - started})
+        except Exception as e:
+            events.put({"index": index, "status": FAILED, "error": str(e)})
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(VARIANT_CONCURRENCY, len(variants))),
+                              thread_name_prefix="variant")
+    try:
+        for index, (tone, length, focus) in enumerate(variants):
+            pool.submit(run, index, tone, length, focus)
+        remaining = len(variants)
+        while remaining:
+            event = events.get()
+            if event.get("status") in (DONE, FAILED):
+                remaining -= 1
+            yield json.dumps(event) + "\n"
+    finally:
+        # Cancelled or finished: stop streaming and don't start the variants still queued
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _variants_collect(*args):
+    return "".join(_variants_job(*args))
+
+def submit_variants(job_description, original_letter, api_key, variants):
+    """Queue one job that generates every variant; raises QueueFullError when saturated."""
+    args = (job_description, original_letter, api_key, variants)
+    if job_queue.executor_kind == "process":
+        return job_queue.submit(_variants_collect, *args)
+    return job_queue.submit(_variants_job, *args)
+
+def _variant_snapshots(job, count):
+    """Per-variant status, text, error and run time, rebuilt from the job's JSON lines."""
+    snapshots = [{"status": QUEUED, "text": "", "error": None, "run_seconds": None} for _ in range(count)]
+    for line in job.text.splitlines():
+        if line.strip():
+            event = json.loads(line)
+            snapshot = snapshots[event.pop("index")]
+            snapshot["text"] += event.pop("text", "")
+            snapshot.update(event)
+    if job.done and job.status != DONE:
+        # The job itself was cancelled or failed, so the unfinished variants never will
+        for snapshot in snapshots:
+            if snapshot["status"] in (QUEUED, RUNNING):
+                snapshot["status"] = job.status
+                snapshot["error"] = job.error
+    return snapshots
+
+def _batch_job(original_letter, sources, api_key, tone, length, focus):
+    """Run a batch on the job queue, yielding one JSON line per finished posting."""
+    results = iter_batch(
+        original_letter, sources, api_key, tone, length, focus,
+        extract=extract_job_description_from_url,
+        generate=generate_adapted_cover_letter,
+        max_concurrency=BATCH_CONCURRENCY,
+        requests_per_minute=BATCH_RPM,
+    )
+    try:
+        for result in results:
+            yield json.dumps(result) + "\n"
+    finally:
+        # A cancelled job closes this generator; pass that on so queued postings never start
+        results.close()
+
+def _batch_collect(*args):
+    return "".join(_batch_job(*args))
+
+def submit_batch(original_letter, sources, api_key, tone, length, focus):
+    """Queue a batch run; its job text accumulates JSONL results as postings finish."""
+    args = (original_letter, sources, api_key, tone, length, focus)
+    if job_queue.executor_kind == "process":
+        return job_queue.submit(_batch_collect, *args)
+    return job_queue.submit(_batch_job, *args)
+
+def _batch_results(job):
+    return [json.loads(line) for line in job.text.splitlines() if line.strip()]
+
+# Scrape-time views of the component counters above, for /metrics
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+def _numeric(stats, *keys):
+    return {(key,): stats[key] for key in keys if key in stats}
+
+Gauge("clg_job_queue_depth", "Jobs queued or running.", job_queue.depth)
+Gauge("clg_job_queue_jobs", "Tracked jobs by state.",
+      lambda: _numeric(job_queue.stats(), QUEUED, RUNNING, DONE, FAILED, CANCELLED), ["state"])
+Gauge("clg_cache_hit_ratio", "Hits over lookups since start.",
+      lambda: {("result",): result_cache.stats()["hit_ratio"], ("postings",): posting_cache.stats()["hit_ratio"]},
+      ["cache"])
+CallbackCounter("clg_cache_lookups_total", "Cache lookups by cache and result.", lambda: {
+    (name, result): cache.stats()[key]
+    for name, cache in (("result", result_cache), ("postings", posting_cache))
+    for result, key in (("memory_hit", "memory_hits"), ("disk_hit", "disk_hits"), ("miss", "misses"))
+}, ["cache", "result"])
+Gauge("clg_cache_entries", "Entries in the in-memory cache tier.",
+      lambda: {("result",): len(result_cache.memory), ("postings",): len(posting_cache.memory)}, ["cache"])
+Gauge("clg_cache_memory_bytes", "Approximate payload bytes in the in-memory postings cache.",
+      lambda: posting_cache.memory.current_bytes)
+CallbackCounter("clg_http_client_events_total", "Job posting fetch counters.",
+                lambda: {(key,): value for key, value in http_client.stats().items() if isinstance(value, (int, float))},
+                ["event"])
+CallbackCounter("clg_llm_guard_events_total", "LLM guard calls, retries, throttling and failures.",
+                lambda: _numeric(llm_guard.stats(), "calls", "retries", "rate_limited", "circuit_rejections", "failures"),
+                ["event"])
+Gauge("clg_llm_circuit_state", "Circuit breaker state per model (0 closed, 1 half open, 2 open).",
+      lambda: {(model,): CIRCUIT_STATES[state] for model, state in llm_guard.stats()["circuits"].items()}, ["model"])
+CallbackCounter("clg_llm_router_events_total", "Model router requests, fallbacks, hedges, timeouts and abandoned attempts.",
+                lambda: _numeric(model_router.stats(), "requests", "fallbacks", "hedges", "hedge_wins", "timeouts",
+                                 "abandoned"),
+                ["event"])
+Gauge("clg_llm_abandoned_running", "Abandoned model calls still holding a router worker.",
+      lambda: model_router.stats()["abandoned_running"])
+CallbackCounter("clg_prompt_tokens_total", "Estimated job description tokens before and after compaction.",
+                lambda: {("before",): prompt_budget.stats()["tokens_before"], ("after",): prompt_budget.stats()["tokens_after"]},
+                ["stage"])
+Gauge("clg_session_entries", "Entries in the session store.", lambda: session_store.stats()["entries"])
+Gauge("clg_session_memory_bytes", "Approximate bytes held by the in-memory session store.",
+      lambda: session_store.stats().get("memory_bytes"))
+
+@server.route("/metrics")
+def metrics():
+    """Prometheus text exposition of stage latencies, LLM timings, cache ratios and queue depths."""
+    return flask.Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+@server.route("/stats/cache")
+def cache_stats():
+    """Expose result cache hit/miss counters as JSON."""
+    return flask.jsonify(result=result_cache.stats(), postings=posting_cache.stats())
+
+@server.route("/stats/prompt")
+def prompt_stats():
+    """Expose job description token counts before and after compaction as JSON."""
+    return flask.jsonify(prompt=prompt_budget.stats())
+
+@server.route("/stats/sessions")
+def session_stats():
+    """Expose session store size and traffic counters as JSON."""
+    return flask.jsonify(sessions=session_store.stats())
+
+@server.route("/stats/http")
+def http_stats():
+    """Expose job-posting fetch counters as JSON."""
+    return flask.jsonify(http=http_client.stats())
+
+@server.route("/stats/llm")
+def llm_stats():
+    """Expose Gemini client pool, guard and model router counters as JSON."""
+    return flask.jsonify(clients=gemini_clients.stats(), guard=llm_guard.stats(), router=model_router.stats())
+
+@server.route("/stats/jobs")
+def job_stats():
+    """Expose job queue depth and state counts as JSON."""
+    return flask.jsonify(jobs=job_queue.stats())
+
+@server.route("/api/jobs", methods=["POST"])
+def api_submit_job():
+    """Submit a generation and return its job id without waiting for the result."""
+    payload = flask.request.get_json(silent=True) or {}
+    missing = [k for k in ("job_description", "original_letter", "api_key") if not payload.get(k)]
+    if missing:
+        return flask.jsonify(error=f"Missing fields: {', '.join(missing)}"), 400
+    
+    try:
+        job = submit_generation(
+            payload["job_description"],
+            payload["original_letter"],
+            payload["api_key"],
+            payload.get("tone", "professional"),
+            payload.get("length", "moderate"),
+            payload.get("focus", "balanced"),
+        )
+    except QueueFullError as e:
+        return flask.jsonify(error=str(e)), 429
+    return flask.jsonify(id=job.id, status=job.status), 202
+
+@server.route("/api/jobs/<job_id>", methods=["GET", "DELETE"])
+def api_job(job_id):
+    """Poll a job's status and partial text, or cancel it with DELETE."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return flask.jsonify(error="Unknown job"), 404
+    if flask.request.method == "DELETE":
+        job_queue.cancel(job_id)
+    return flask.jsonify(job.snapshot())
 
 # Callbacks
 @app.callback(
-    Output("api-key-store", "data"),
     Output("api-key-status", "children"),
     Input("save-api-key", "n_clicks"),
     State("api-key", "value"),
+    State("session-id", "data"),
     prevent_initial_call=True,
 )
-def save_api_key(n_clicks, api_key):
+def save_api_key(n_clicks, api_key, session_id):
     if not api_key:
-        return None, html.Span("Please enter an API key", className="text-danger")
+        session_store.delete(session_id, "api_key")
+        return html.Span("Please enter an API key", className="text-danger")
     
+    # The key stays on the server; later callbacks look it up by session id
     # In a real application, you might want to test the API key here
-    return api_key, html.Span("API key saved successfully!", className="text-success")
+    session_store.set(session_id, "api_key", api_key)
+    return html.Span("API key saved successfully!", className="text-success")
 
 @app.callback(
     Output("upload-job", "contents"),
@@ -746,79 +1350,80 @@ def update_job_description(upload_contents, extract_btn, upload_filename, url):
     # Fallback
     raise PreventUpdate
 
-# Combined callback for original cover letter updates (from file upload and PDF extraction)
+# Send the PDF bytes to /upload from the browser; server callbacks only ever see the handle
+app.clientside_callback(
+    ClientsideFunction(namespace="uploads", function_name="post_upload"),
+    Output("pdf-upload-handle", "data"),
+    Input("pdf-upload", "contents"),
+    State("pdf-upload", "filename"),
+    State("session-id", "data"),
+    prevent_initial_call=True,
+)
+
+# Plain text/Word uploads go straight into the cover letter
 @app.callback(
     Output("original-cover-letter", "value"),
     Output("cover-letter-tabs", "value"),
+    Input("upload-letter", "contents"),
+    State("upload-letter", "filename"),
+    prevent_initial_call=True,
+)
+def update_cover_letter(upload_contents, upload_filename):
+    if upload_contents is None:
+        raise PreventUpdate
+    return parse_file_contents(upload_contents, upload_filename), dash.no_update
+
+# One pass per PDF upload: extract the text once, keep it in the session and
+# fan the result out to the status message and the extracted-cover-letter store
+@app.callback(
     Output("pdf-upload-status", "children"),
-    [Input("upload-letter", "contents"),
-     Input("pdf-upload", "contents")],
-    [State("upload-letter", "filename"),
-     State("pdf-upload", "filename")],
+    Output("extracted-cover-letter", "data"),
+    Input("pdf-upload-handle", "data"),
+    State("session-id", "data"),
     prevent_initial_call=True,
 )
-def update_cover_letter(upload_contents, pdf_contents, upload_filename, pdf_filename):
-    # Get the ID of the component that triggered the callback
-    ctx = callback_context
-    if not ctx.triggered:
+def process_pdf_upload(pdf_upload, session_id):
+    if not pdf_upload:
         raise PreventUpdate
     
-    trigger_id = ctx.triggered[0]['prop_id'].split('.')[0]
+    if pdf_upload.get("error"):
+        pdf_status = html.Div([
+            html.I(className="fas fa-exclamation-triangle text-danger me-2"),
+            pdf_upload["error"]
+        ])
+        return pdf_status, dash.no_update
     
-    # Default values
-    pdf_status = dash.no_update
-    tab_value = dash.no_update
+    pdf_filename = pdf_upload.get("filename")
+    if not pdf_filename or not pdf_filename.lower().endswith('.pdf'):
+        pdf_status = html.Div([
+            html.I(className="fas fa-exclamation-triangle text-warning me-2"),
+            "Please upload a PDF file."
+        ])
+        return pdf_status, dash.no_update
     
-    # Handle regular file upload
-    if trigger_id == "upload-letter" and upload_contents is not None:
-        parsed_content = parse_file_contents(upload_contents, upload_filename)
-        return parsed_content, tab_value, pdf_status
-    
-    # Handle PDF upload and extraction
-    elif trigger_id == "pdf-upload" and pdf_contents is not None:
-        if not pdf_filename or not pdf_filename.lower().endswith('.pdf'):
-            pdf_status = html.Div([
-                html.I(className="fas fa-exclamation-triangle text-warning me-2"),
-                "Please upload a PDF file."
-            ])
-            return dash.no_update, dash.no_update, pdf_status
-        
-        extracted_text = extract_pdf_text(pdf_contents, pdf_filename)
-        
-        if extracted_text and len(extracted_text) > 50:  # Basic validation
-            # Store the extracted text and provide a button to use it
-            pdf_status = html.Div([
-                html.I(className="fas fa-check-circle text-success me-2"),
-                f"Successfully extracted cover letter from {pdf_filename}",
-                html.Br(),
-                html.Button(
-                    "Use this text",
-                    id="use-pdf-text-btn",
-                    className="btn btn-primary btn-sm mt-2",
-                    style={"fontSize": "0.8rem"}
-                )
-            ])
-            # Also store the extracted text in the dcc.Store component
-            app.clientside_callback(
-                """
-                function(text) {
-                    return text;
-                }
-                """,
-                Output("extracted-cover-letter", "data"),
-                [Input("pdf-upload", "contents")],
-                [State("extracted-cover-letter", "data")]
+    extracted_text = extract_uploaded_pdf_text(pdf_upload["handle"], session_id)
+    
+    if extracted_text and len(extracted_text) > 50:  # Basic validation
+        # Keep the text server-side; the browser only learns that it is ready
+        session_store.set(session_id, "extracted_letter", extracted_text)
+        pdf_status = html.Div([
+            html.I(className="fas fa-check-circle text-success me-2"),
+            f"Successfully extracted cover letter from {pdf_filename}",
+            html.Br(),
+            html.Button(
+                "Use this text",
+                id="use-pdf-text-btn",
+                className="btn btn-primary btn-sm mt-2",
+                style={"fontSize": "0.8rem"}
             )
-            return dash.no_update, dash.no_update, pdf_status
-        else:
-            pdf_status = html.Div([
-                html.I(className="fas fa-exclamation-triangle text-danger me-2"),
-                "Could not extract text properly from this PDF."
-            ])
-            return dash.no_update, dash.no_update, pdf_status
+        ])
+        return pdf_status, {"filename": pdf_filename, "chars": len(extracted_text)}
     
-    # Fallback
-    raise PreventUpdate
+    pdf_status = html.Div([
+        html.I(className="fas fa-exclamation-triangle text-danger me-2"),
+        "Could not extract text properly from this PDF."
+    ])
+    return pdf_status, None
 
 # Add a separate callback for the "Use this text" button
 @app.callback(
@@ -826,70 +1431,431 @@ def update_cover_letter(upload_contents, pdf_contents, upload_filename, pdf_file
     Output("cover-letter-tabs", "value", allow_duplicate=True), 
     Input("use-pdf-text-btn", "n_clicks"),
     State("extracted-cover-letter", "data"),
+    State("session-id", "data"),
     prevent_initial_call=True
 )
-def use_extracted_text(n_clicks, extracted_text):
-    if n_clicks is None or not extracted_text:
+def use_extracted_text(n_clicks, extracted, session_id):
+    if n_clicks is None or not extracted:
         raise PreventUpdate
     
-    return extracted_text, "manual-cover-tab"
-
-# Keep your existing function to store the PDF text 
-@app.callback(
-    Output("extracted-cover-letter", "data"),
-    Input("pdf-upload", "contents"),
-    State("pdf-upload", "filename"),
-    prevent_initial_call=True,
-)
-def store_pdf_text(contents, filename):
-    if contents is None or not filename or not filename.lower().endswith('.pdf'):
+    extracted_text = session_store.get(session_id, "extracted_letter")
+    if not extracted_text:
         raise PreventUpdate
-    
-    extracted_text = extract_pdf_text(contents, filename)
-    
-    if extracted_text and len(extracted_text) > 50:  # Basic validation
-        return extracted_text
-    
-    return None
+    return extracted_text, "manual-cover-tab"
 
 @app.callback(
     Output("loading-indicator", "style"),
     Output("result-row", "style"),
     Output("generated-cover-letter", "value"),
     Output("generation-time", "children"),
+    Output("generation-job", "data"),
+    Output("generation-poll", "disabled"),
     Input("generate-btn", "n_clicks"),
     State("job-description", "value"),
     State("original-cover-letter", "value"),
-    State("api-key-store", "data"),
+    State("session-id", "data"),
     State("tone-dropdown", "value"),
     State("length-dropdown", "value"),
     State("focus-dropdown", "value"),
     prevent_initial_call=True,
 )
-def generate_cover_letter(n_clicks, job_desc, original_letter, api_key, tone, length, focus):
+def generate_cover_letter(n_clicks, job_desc, original_letter, session_id, tone, length, focus):
     if not n_clicks:
         raise PreventUpdate
     
     if not job_desc or not original_letter:
-        return {"display": "none"}, {"display": "none"}, "", ""
+        return {"display": "none"}, {"display": "none"}, "", "", None, True
     
+    api_key = session_store.get(session_id, "api_key")
     if not api_key:
-        return {"display": "none"}, {"display": "block"}, "Please save an API key first.", ""
+        return {"display": "none"}, {"display": "block"}, "Please save an API key first.", "", None, True
+    
+    # Queue the generation; generation-poll picks up status and streamed chunks
+    try:
+        job = submit_generation(job_desc, original_letter, api_key, tone, length, focus)
+    except QueueFullError as e:
+        return {"display": "none"}, {"display": "block"}, "", html.Span(str(e), className="text-danger"), None, True
+    
+    # Remember the inputs so later edits can be revised instead of regenerated
+    start_revision_session(session_id, job, job_desc, original_letter, tone, length, focus)
     
-    # Show loading indicator
+    # Show loading indicator until the first chunks arrive
     loading_style = {"display": "block", "textAlign": "center", "paddingTop": "20px", "paddingBottom": "20px"}
     
-    # Generate the adapted cover letter
-    adapted_letter = generate_adapted_cover_letter(job_desc, original_letter, api_key, tone, length, focus)
+    # Show results
+    result_style = {"display": "block"}
+    
+    return loading_style, result_style, "", "Queued...", job.id, False
+
+@app.callback(
+    Output("generated-cover-letter", "value", allow_duplicate=True),
+    Output("generation-time", "children", allow_duplicate=True),
+    Output("loading-indicator", "style", allow_duplicate=True),
+    Output("generation-poll", "disabled", allow_duplicate=True),
+    Input("generation-poll", "n_intervals"),
+    State("generation-job", "data"),
+    State("session-id", "data"),
+    prevent_initial_call=True,
+)
+def poll_generation_job(n_intervals, job_id, session_id):
+    if not job_id:
+        raise PreventUpdate
+    
+    job = job_queue.get(job_id)
+    if job is None:
+        # Already collected by an earlier tick, or expired; leave the letter as it is
+        return dash.no_update, dash.no_update, {"display": "none"}, True
+    
+    snapshot = job.snapshot()
+    text = snapshot["text"]
+    
+    if not job.done:
+        if snapshot["status"] == QUEUED:
+            return dash.no_update, f"Queued for {snapshot['queued_seconds']:.0f}s...", dash.no_update, False
+        # Hide the spinner as soon as the first tokens are on screen.
+        # Revisions produce no text until they finish, so the current letter stays put.
+        loading_style = {"display": "none"} if text else dash.no_update
+        return text or dash.no_update, "Generating...", loading_style, False
+    
+    session = settle_revision_session(session_id)
+    job_queue.release(job_id)
+    
+    if snapshot["status"] == FAILED:
+        # Keep errors out of the letter box; any partial text stays as it was
+        error = html.Span(f"Error generating cover letter: {snapshot['error']}", className="text-danger")
+        return text or dash.no_update, error, {"display": "none"}, True
+    
+    if snapshot["status"] == CANCELLED:
+        return text or dash.no_update, "Generation cancelled.", {"display": "none"}, True
     
     # Get current time for timestamp
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    time_display = f"Generated on {current_time}"
+    time_display = f"Generated on {current_time} in {snapshot['run_seconds'] or 0:.1f}s"
+    report = session.get("report") if session else None
+    if report:
+        time_display = (
+            f"Revised {report['revised']} of {report['paragraphs']} paragraphs on {current_time} "
+            f"in {snapshot['run_seconds'] or 0:.1f}s (~{report['prompt_tokens']} prompt tokens "
+            f"vs ~{report['full_prompt_tokens']} for a full rewrite)"
+        )
     
-    # Show results
-    result_style = {"display": "block"}
+    return text, time_display, {"display": "none"}, True
+
+@app.callback(
+    Output("generation-time", "children", allow_duplicate=True),
+    Input("cancel-generation-btn", "n_clicks"),
+    State("generation-job", "data"),
+    prevent_initial_call=True,
+)
+def cancel_generation(n_clicks, job_id):
+    if not n_clicks or not job_id:
+        raise PreventUpdate
+    
+    job_queue.cancel(job_id)
+    return "Cancelling..."
+
+@app.callback(
+    Output("loading-indicator", "style", allow_duplicate=True),
+    Output("generation-time", "children", allow_duplicate=True),
+    Output("generation-job", "data", allow_duplicate=True),
+    Output("generation-poll", "disabled", allow_duplicate=True),
+    Input("revise-btn", "n_clicks"),
+    State("generated-cover-letter", "value"),
+    State("job-description", "value"),
+    State("original-cover-letter", "value"),
+    State("session-id", "data"),
+    State("tone-dropdown", "value"),
+    State("length-dropdown", "value"),
+    State("focus-dropdown", "value"),
+    prevent_initial_call=True,
+)
+def revise_cover_letter(n_clicks, letter, job_desc, original_letter, session_id, tone, length, focus):
+    if not n_clicks:
+        raise PreventUpdate
+    
+    def message(text, class_name="text-danger"):
+        return dash.no_update, html.Span(text, className=class_name), dash.no_update, dash.no_update
+    
+    api_key = session_store.get(session_id, "api_key")
+    if not api_key:
+        return message("Please save an API key first.")
+    
+    session = settle_revision_session(session_id)
+    if not session or session.get("pending"):
+        return message("Wait for the current letter to finish before revising it.")
+    if not session.get("letter") or not letter:
+        return message("Generate a letter first, then edit it or the job description and revise.")
+    if (tone, length, focus, original_letter) != (session["tone"], session["length"], session["focus"], session["original_letter"]):
+        return message("Settings or your original letter changed; use Generate for a full rewrite.")
+    
+    plan = plan_revision(session, letter, job_desc or "", tone, length, focus)
+    if not plan["targets"]:
+        return message("No changes to revise.", "text-muted")
+    
+    try:
+        job = job_queue.submit(revise_paragraphs, plan["paragraphs"], plan["targets"], api_key)
+    except QueueFullError as e:
+        return message(str(e))
+    
+    full_prompt, _ = build_budgeted_prompt(job_desc or "", original_letter, tone, length, focus)
+    report = {
+        "revised": len(plan["targets"]),
+        "paragraphs": len(plan["paragraphs"]),
+        "prompt_tokens": plan["prompt_tokens"],
+        "full_prompt_tokens": estimate_tokens(full_prompt),
+    }
+    start_revision_session(session_id, job, job_desc or "", original_letter, tone, length, focus, report)
+    
+    loading_style = {"display": "block", "textAlign": "center", "paddingTop": "20px", "paddingBottom": "20px"}
+    status = f"Revising {report['revised']} of {report['paragraphs']} paragraphs..."
+    return loading_style, status, job.id, False
+
+@app.callback(
+    Output("batch-job", "data"),
+    Output("batch-poll", "disabled"),
+    Output("batch-status", "children"),
+    Output("batch-download-btn", "disabled"),
+    Input("batch-run-btn", "n_clicks"),
+    State("batch-sources", "value"),
+    State("original-cover-letter", "value"),
+    State("session-id", "data"),
+    State("tone-dropdown", "value"),
+    State("length-dropdown", "value"),
+    State("focus-dropdown", "value"),
+    prevent_initial_call=True,
+)
+def run_batch(n_clicks, sources_text, original_letter, session_id, tone, length, focus):
+    if not n_clicks:
+        raise PreventUpdate
+    
+    api_key = session_store.get(session_id, "api_key")
+    sources = parse_sources(sources_text)
+    if not sources:
+        return None, True, html.Span("Please enter at least one job URL or description", className="text-danger"), True
+    if len(sources) > BATCH_MAX_SOURCES:
+        return None, True, html.Span(f"A batch can contain at most {BATCH_MAX_SOURCES} postings", className="text-danger"), True
+    if not original_letter:
+        return None, True, html.Span("Please provide your original cover letter first", className="text-danger"), True
+    if not api_key:
+        return None, True, html.Span("Please save an API key first.", className="text-danger"), True
+    
+    try:
+        job = submit_batch(original_letter, sources, api_key, tone, length, focus)
+    except QueueFullError as e:
+        return None, True, html.Span(str(e), className="text-danger"), True
+    
+    return {"id": job.id, "total": len(sources)}, False, html.Span(f"Queued {len(sources)} postings...", className="text-muted"), True
+
+@app.callback(
+    Output("batch-status", "children", allow_duplicate=True),
+    Output("batch-poll", "disabled", allow_duplicate=True),
+    Output("batch-download-btn", "disabled", allow_duplicate=True),
+    Input("batch-poll", "n_intervals"),
+    State("batch-job", "data"),
+    State("session-id", "data"),
+    prevent_initial_call=True,
+)
+def poll_batch(n_intervals, batch, session_id):
+    if not batch:
+        raise PreventUpdate
+    
+    job = job_queue.get(batch["id"])
+    if job is None:
+        return html.Span("Batch session expired. Please run it again.", className="text-danger"), True, True
+    
+    results = sorted(_batch_results(job), key=lambda r: r["index"])
+    failed = sum(1 for r in results if r["status"] != "ok")
+    items = [
+        html.Li(
+            [
+                html.I(className="fas fa-check-circle text-success me-2" if r["status"] == "ok"
+                       else "fas fa-exclamation-triangle text-danger me-2"),
+                r["source"][:80],
+                html.Span(f" ({r['seconds']:.1f}s)", className="text-muted") if r["status"] == "ok"
+                else html.Span(f" - {r['error']}", className="text-danger"),
+            ]
+        )
+        for r in results
+    ]
+    
+    if job.status == FAILED:
+        summary = html.Span(f"Batch failed: {job.error}", className="text-danger")
+    elif job.done:
+        run_seconds = job.timings()["run_seconds"] or 0
+        summary = html.Span(
+            f"Finished {len(results)}/{batch['total']} postings in {run_seconds:.1f}s ({failed} failed)",
+            className="text-success",
+        )
+    else:
+        summary = html.Span(f"Completed {len(results)}/{batch['total']} postings...", className="text-muted")
+    
+    if job.done:
+        # The results move to the session (and expire with it) for the download button
+        session_store.set(session_id, "batch_results", results)
+        job_queue.release(job.id)
+    
+    status = html.Div([summary, html.Ul(items, className="mt-2 small")])
+    return status, job.done, not (job.done and len(results) > failed)
+
+@app.callback(
+    Output("batch-download", "data"),
+    Input("batch-download-btn", "n_clicks"),
+    State("session-id", "data"),
+    prevent_initial_call=True,
+)
+def download_batch(n_clicks, session_id):
+    if not n_clicks:
+        raise PreventUpdate
+    
+    results = session_store.get(session_id, "batch_results")
+    if not results:
+        raise PreventUpdate
+    
+    filename = f"Cover_Letters_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return dcc.send_bytes(results_to_zip(results), filename)
+
+@app.callback(
+    Output("variant-jobs", "data"),
+    Output("variant-poll", "disabled"),
+    Output("variant-status", "children"),
+    Output("variant-row", "style"),
+    Output("variant-results", "children"),
+    Input("variant-btn", "n_clicks"),
+    State("variant-tones", "value"),
+    State("variant-lengths", "value"),
+    State("variant-focuses", "value"),
+    State("job-description", "value"),
+    State("original-cover-letter", "value"),
+    State("session-id", "data"),
+    State("tone-dropdown", "value"),
+    State("length-dropdown", "value"),
+    State("focus-dropdown", "value"),
+    prevent_initial_call=True,
+)
+def compare_variants(n_clicks, tones, lengths, focuses, job_desc, original_letter, session_id, tone, length, focus):
+    if not n_clicks:
+        raise PreventUpdate
+    
+    api_key = session_store.get(session_id, "api_key")
+
+    def error(message):
+        return None, True, html.Span(message, className="text-danger"), dash.no_update, dash.no_update
+    
+    if not job_desc or not original_letter:
+        return error("Please provide a job description and your original cover letter first")
+    if not api_key:
+        return error("Please save an API key first.")
+    
+    variants = variant_combinations(tones, lengths, focuses, tone, length, focus)
+    if len(variants) < 2:
+        return error("Pick at least two tones, lengths or focuses to compare")
+    if len(variants) > MAX_VARIANTS:
+        return error(f"That is {len(variants)} combinations; compare at most {MAX_VARIANTS} at a time")
+    
+    # One job per comparison; its variants stream in parallel and finish in about the slowest one's time
+    try:
+        job = submit_variants(job_desc, original_letter, api_key, variants)
+    except QueueFullError as e:
+        return error(str(e))
+    
+    data = {"id": job.id, "variants": [{"tone": v[0], "length": v[1], "focus": v[2]} for v in variants]}
+    status = html.Span(f"Generating {len(variants)} variants...", className="text-muted")
+    return data, False, status, {"display": "block"}, _variant_cards(data["variants"], [None] * len(variants))
+
+def _variant_cards(variants, snapshots):
+    cards = []
+    for index, (variant, snapshot) in enumerate(zip(variants, snapshots)):
+        title = _variant_label(variant)
+        if snapshot is None or snapshot["status"] == QUEUED:
+            status = html.Span("Queued...", className="text-muted")
+        elif snapshot["status"] == FAILED:
+            status = html.Span(f"Error: {snapshot['error']}", className="text-danger")
+        elif snapshot["status"] == CANCELLED:
+            status = html.Span("Cancelled", className="text-muted")
+        elif snapshot["status"] == DONE:
+            status = html.Span(f"Done in {snapshot['run_seconds'] or 0:.1f}s", className="text-success")
+        else:
+            status = html.Span("Generating...", className="text-muted")
+        cards.append(
+            dbc.Col(
+                dbc.Card(
+                    [
+                        dbc.CardHeader([html.Span(title, className="fw-bold me-2"), html.Small(status)]),
+                        dbc.CardBody(
+                            [
+                                dcc.Textarea(
+                                    id={"type": "variant-text", "index": index},
+                                    value=snapshot["text"] if snapshot else "",
+                                    readOnly=True,
+                                    style={"width": "100%", "height": "300px", "borderRadius": "8px", "padding": "10px"},
+                                    className="mb-2",
+                                ),
+                                dbc.Button(
+                                    "Use this version",
+                                    id={"type": "use-variant", "index": index},
+                                    color="primary",
+                                    size="sm",
+                                    outline=True,
+                                    style=button_style,
+                                ),
+                            ]
+                        ),
+                    ],
+                    className="h-100",
+                ),
+                lg=4,
+                md=6,
+                className="mb-3",
+            )
+        )
+    return cards
+
+@app.callback(
+    Output("variant-results", "children", allow_duplicate=True),
+    Output("variant-status", "children", allow_duplicate=True),
+    Output("variant-poll", "disabled", allow_duplicate=True),
+    Input("variant-poll", "n_intervals"),
+    State("variant-jobs", "data"),
+    prevent_initial_call=True,
+)
+def poll_variants(n_intervals, data):
+    if not data:
+        raise PreventUpdate
+    
+    job = job_queue.get(data["id"])
+    if job is None:
+        # Collected by an earlier tick; the cards already hold the final text
+        return dash.no_update, dash.no_update, True
+    
+    variants = data["variants"]
+    snapshots = _variant_snapshots(job, len(variants))
+    if not job.done:
+        finished = sum(s["status"] in (DONE, FAILED) for s in snapshots)
+        status = html.Span(f"Finished {finished}/{len(variants)} variants...", className="text-muted")
+        return _variant_cards(variants, snapshots), status, False
+    
+    job_queue.release(job.id)
+    # Wall time from submission to the last finish, i.e. about the slowest variant
+    elapsed = job.finished_at - job.submitted_at
+    status = html.Span(f"Generated {len(variants)} variants in {elapsed:.1f}s", className="text-success")
+    return _variant_cards(variants, snapshots), status, True
+
+@app.callback(
+    Output("generated-cover-letter", "value", allow_duplicate=True),
+    Output("result-row", "style", allow_duplicate=True),
+    Output("generation-time", "children", allow_duplicate=True),
+    Input({"type": "use-variant", "index": ALL}, "n_clicks"),
+    State({"type": "variant-text", "index": ALL}, "value"),
+    State("variant-jobs", "data"),
+    prevent_initial_call=True,
+)
+def use_variant(n_clicks, texts, data):
+    triggered = callback_context.triggered_id
+    if not triggered or not any(n_clicks) or not texts[triggered["index"]]:
+        raise PreventUpdate
     
-    return loading_style, result_style, adapted_letter, time_display
+    variant = data["variants"][triggered["index"]]
+    return texts[triggered["index"]], {"display": "block"}, f"Variant: {_variant_label(variant)}"
 
 @app.callback(
     Output("copy-status", "children"),
@@ -0,0 +1,43 @@
+// Streams dcc.Upload files to the server's upload route as raw bytes so that
+// Dash callbacks receive a small handle instead of the base64 data URL.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    uploads: {
+        post_upload: function(contents, filename, sessionId) {
+            if (!contents) {
+                return window.dash_clientside.no_update;
+            }
+
+            var comma = contents.indexOf(",");
+            var mimeType = contents.slice(5, comma).split(";")[0] || "application/octet-stream";
+            var binary = atob(contents.slice(comma + 1));
+            var bytes = new Uint8Array(binary.length);
+            for (var i = 0; i < binary.length; i++) {
+                bytes[i] = binary.charCodeAt(i);
+            }
+
+            // The server registers the route under the same prefix as Dash's own routes
+            var config = JSON.parse(document.getElementById("_dash-config").textContent);
+            var url = config.requests_pathname_prefix + "upload?filename=" + encodeURIComponent(filename || "");
+
+            // Dash waits for the returned promise, so the page stays responsive during the upload
+            return fetch(url, {
+                method: "POST",
+                // The session id is the key to the saved API key, so it goes in a header rather than the URL
+                headers: {"Content-Type": mimeType, "X-CLG-Session": sessionId || ""},
+                body: new Blob([bytes], {type: mimeType}),
+                credentials: "same-origin"
+            }).then(function(response) {
+                return response.json().catch(function() {
+                    return {};
+                }).then(function(body) {
+                    if (!response.ok) {
+                        return {error: body.error || ("Upload failed with status " + response.status), filename: filename};
+                    }
+                    return body;
+                });
+            }, function(e) {
+                return {error: "Upload failed: " + e.message, filename: filename};
+            });
+        }
+    }
+});
@@ -0,0 +1,245 @@
+"""Tailor one cover letter to many job postings in parallel.
+
+Usage:
+    python -m batch --letter letter.txt --jobs postings.txt --out results.zip
+
+The jobs file holds one job URL per line, blocks of job description text
+separated by lines containing only ``---``, or JSON lines with a ``url`` or
+``job_description`` field. Results are written as they finish, to JSONL or
+to a ZIP containing one text file per letter plus a manifest.
+"""
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.parse
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def is_url(text):
+    parsed = urllib.parse.urlparse(text.strip())
+    return parsed.scheme in ("http", "https") and bool(parsed.netloc) and " " not in text.strip()
+
+
+def parse_sources(text):
+    """Split pasted batch input into a list of URLs and job description texts."""
+    sources = []
+    for block in re.split(r"^\s*---\s*$", text or "", flags=re.MULTILINE):
+        lines = [line.strip() for line in block.splitlines() if line.strip()]
+        if not lines:
+            continue
+        if all(is_url(line) for line in lines):
+            sources.extend(lines)
+        else:
+            sources.append(block.strip())
+    return sources
+
+
+def load_sources(path):
+    """Read batch sources from a text or JSONL file."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".jsonl"):
+        sources = []
+        for line in text.splitlines():
+            if line.strip():
+                item = json.loads(line)
+                sources.append(item.get("url") or item.get("job_description") or "")
+        return [s for s in sources if s]
+    return parse_sources(text)
+
+
+class RateLimiter:
+    """Spaces calls evenly so no more than `per_minute` start in any minute."""
+
+    def __init__(self, per_minute=None):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def _process_source(index, source, original_letter, api_key, tone, length, focus,
+                    extract, generate, limiter):
+    started = time.time()
+    result = {"index": index, "source": source, "status": "ok", "cover_letter": None, "error": None}
+
+    if is_url(source):
+        job_description, message = extract(source)
+        if not job_description:
+            result.update(status="error", error=message, seconds=time.time() - started)
+            return result
+    else:
+        job_description = source
+
+    # Retries and backoff on throttling happen inside generate (see rate_limit.LLMGuard)
+    limiter.acquire()
+    generation = generate(job_description, original_letter, api_key, tone, length, focus)
+    if generation.compaction:
+        result["tokens_before"] = generation.compaction["tokens_before"]
+        result["tokens_after"] = generation.compaction["tokens_after"]
+    if generation.ok:
+        result["cover_letter"] = generation.text
+    else:
+        result.update(status="error", error=generation.error, error_kind=generation.error_kind)
+
+    result["seconds"] = time.time() - started
+    return result
+
+
+def iter_batch(original_letter, sources, api_key, tone="professional", length="moderate",
+               focus="balanced", extract=None, generate=None, max_concurrency=4,
+               requests_per_minute=None):
+    """Run every source concurrently and yield result dicts in completion order.
+
+    ``generate`` returns a rate_limit.GenerationResult. Closing the generator
+    cancels the postings that haven't started.
+    """
+    limiter = RateLimiter(requests_per_minute)
+    pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="batch")
+    finished = False
+    try:
+        futures = [
+            pool.submit(_process_source, index, source, original_letter, api_key, tone, length,
+                        focus, extract, generate, limiter)
+            for index, source in enumerate(sources)
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+        finished = True
+    finally:
+        # Closed early (batch cancelled, server draining) or failed: don't start the postings
+        # still queued, and don't wait for the ones already running
+        pool.shutdown(wait=finished, cancel_futures=not finished)
+
+
+def _letter_filename(result):
+    source = result["source"]
+    if is_url(source):
+        parsed = urllib.parse.urlparse(source)
+        label = f"{parsed.netloc}{parsed.path}"
+    else:
+        label = source[:40]
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")[:60] or "job"
+    return f"{result['index'] + 1:03d}_{slug}.txt"
+
+
+class JsonlWriter:
+    """Appends one JSON line per result, flushing so partial runs are usable."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+
+    def write(self, result):
+        self.fileobj.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self.fileobj.flush()
+
+    def close(self):
+        pass
+
+
+class ZipWriter:
+    """Writes each finished letter into a ZIP, with a manifest.jsonl on close."""
+
+    def __init__(self, fileobj):
+        self.zip = zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED)
+        self.manifest = []
+
+    def write(self, result):
+        entry = {k: v for k, v in result.items() if k != "cover_letter"}
+        if result["status"] == "ok":
+            entry["file"] = _letter_filename(result)
+            self.zip.writestr(entry["file"], result["cover_letter"])
+        self.manifest.append(entry)
+
+    def close(self):
+        self.manifest.sort(key=lambda entry: entry["index"])
+        lines = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in self.manifest)
+        self.zip.writestr("manifest.jsonl", lines)
+        self.zip.close()
+
+
+def results_to_zip(results):
+    """Build an in-memory ZIP archive from a list of result dicts."""
+    buffer = io.BytesIO()
+    writer = ZipWriter(buffer)
+    for result in results:
+        writer.write(result)
+    writer.close()
+    return buffer.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tailor one cover letter to many job postings.")
+    parser.add_argument("--letter", required=True, help="Path to the original cover letter (text)")
+    parser.add_argument("--jobs", required=True, help="Text or JSONL file with job URLs/descriptions")
+    parser.add_argument("--out", default="-", help="Output .jsonl or .zip file (default: stdout JSONL)")
+    parser.add_argument("--api-key", default=os.environ.get("GOOGLE_API_KEY"),
+                        help="Google AI Studio API key (default: $GOOGLE_API_KEY)")
+    parser.add_argument("--tone", default="professional")
+    parser.add_argument("--length", default="moderate")
+    parser.add_argument("--focus", default="balanced")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum parallel requests")
+    parser.add_argument("--rpm", type=int, default=None, help="Maximum generation requests per minute")
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("an API key is required (--api-key or GOOGLE_API_KEY)")
+
+    # Imported here so `import batch` stays cheap and doesn't build the Dash app
+    from app2 import extract_job_description_from_url, generate_adapted_cover_letter
+
+    with open(args.letter, encoding="utf-8") as f:
+        original_letter = f.read()
+    sources = load_sources(args.jobs)
+    if not sources:
+        parser.error(f"no job URLs or descriptions found in {args.jobs}")
+
+    if args.out == "-":
+        out, writer = None, JsonlWriter(sys.stdout)
+    elif args.out.endswith(".zip"):
+        out = open(args.out, "wb")
+        writer = ZipWriter(out)
+    else:
+        out = open(args.out, "w", encoding="utf-8")
+        writer = JsonlWriter(out)
+
+    started = time.time()
+    failures = 0
+    try:
+        for done, result in enumerate(iter_batch(
+            original_letter, sources, args.api_key, args.tone, args.length, args.focus,
+            extract=extract_job_description_from_url,
+            generate=generate_adapted_cover_letter,
+            max_concurrency=args.concurrency,
+            requests_per_minute=args.rpm,
+        ), start=1):
+            writer.write(result)
+            failures += result["status"] != "ok"
+            print(f"[{done}/{len(sources)}] {result['status']}: {result['source'][:70]}", file=sys.stderr)
+    finally:
+        writer.close()
+        if out is not None:
+            out.close()
+
+    print(f"Finished {len(sources)} postings in {time.time() - started:.1f}s ({failures} failed)",
+          file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Compare HTML extraction backends on the saved job-board corpus.
+
+Runs the original BeautifulSoup + class_-lambda extractor and every
+installed html_extract backend over each page, checks they agree on the
+extracted text, and prints the best-of-N time per page and the speed-up.
+
+    python -m benchmarks.bench_html_extract [--repeat 5]
+"""
+import argparse
+import glob
+import os
+import re
+import time
+
+from html_extract import available_backends, get_backend
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HTML_DIR = os.path.join(HERE, "corpus", "html")
+
+
+def legacy_extract(html):
+    """The extractor as it was before html_extract, kept as the baseline."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for script in soup(["script", "style"]):
+        script.extract()
+    job_containers = soup.find_all(['div', 'section'], class_=lambda c: c and any(term in str(c).lower() for term in
+                                                          ['job-description', 'description', 'details', 'jobDesc', 'job_des',
+                                                           'jobdetail', 'job-details']))
+    if job_containers:
+        return job_containers[0].get_text(separator=' ', strip=True)
+    main_content = soup.find(['main', 'article']) or soup.find('div', {'id': 'content'})
+    if main_content:
+        return main_content.get_text(separator=' ', strip=True)
+    body = soup.find('body')
+    if body:
+        for element in body.find_all(['header', 'nav', 'footer']):
+            element.extract()
+        return body.get_text(separator=' ', strip=True)
+    return ""
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def best_of(fn, html, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(html)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def load_corpus():
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(HTML_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages[os.path.basename(path)] = f.read()
+    return pages
+
+
+def run(repeat=5):
+    pages = load_corpus()
+    extractors = [("legacy", legacy_extract)]
+    extractors += [(name, get_backend(name).extract) for name in available_backends()]
+
+    results = {}
+    header = f"{'page':<22}{'KB':>7}" + "".join(f"{name:>14}" for name, _ in extractors)
+    print(header)
+    print("-" * len(header))
+    for page, html in pages.items():
+        expected = _normalize(legacy_extract(html))
+        row = {}
+        for name, fn in extractors:
+            if _normalize(fn(html)) != expected:
+                raise AssertionError(f"{name} disagrees with the legacy extractor on {page}")
+            row[name] = best_of(fn, html, repeat)
+        results[page] = row
+        print(f"{page:<22}{len(html) / 1024:>7.0f}" + "".join(
+            f"{row[name] * 1000:>11.1f} ms" for name, _ in extractors))
+
+    print()
+    for name, _ in extractors[1:]:
+        total = sum(row[name] for row in results.values())
+        legacy = sum(row["legacy"] for row in results.values())
+        print(f"{name:<14} {legacy / total:5.1f}x faster than legacy over the corpus")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Track how long ``import app2`` takes, which is most of a worker's boot time.
+
+Imports app2 in fresh interpreters with ``python -X importtime`` and reports
+the best cumulative time for app2 and the slowest modules it imports. It
+also checks that the modules in ``app2.LAZY_MODULES`` are still loaded on
+first use rather than at import.
+
+``--save-baseline`` records the result in baselines/import.json; later runs
+exit non-zero when the import is slower than ``--tolerance`` allows or when
+a lazy module is imported eagerly again.
+
+    python -m benchmarks.bench_import [--repeat 5] [--top 15] [--raw importtime.log]
+    python -m benchmarks.bench_import --save-baseline
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+BASELINE_PATH = os.path.join(HERE, "baselines", "import.json")
+
+# Run in the child: import the app, then list any lazy module that got loaded anyway
+PROBE = "import sys, json, app2; print(json.dumps([m for m in app2.LAZY_MODULES if m in sys.modules]))"
+
+
+def parse_importtime(log):
+    """Parse ``-X importtime`` output into (name, depth, self_us, cumulative_us) rows, in order."""
+    rows = []
+    for line in log.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def import_once():
+    """Import app2 in a fresh interpreter; returns (rows, eagerly loaded lazy modules, raw log)."""
+    env = dict(os.environ)
+    env.pop("CLG_PREWARM", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return parse_importtime(result.stderr), json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def app2_children(rows):
+    """Modules imported directly by app2 with their cumulative time, slowest first."""
+    # importtime prints a module after everything it imported, so app2's children precede its own row
+    index = next(i for i, row in enumerate(rows) if row[0] == "app2")
+    depth = rows[index][1]
+    children = []
+    for name, row_depth, _, cumulative in reversed(rows[:index]):
+        if row_depth <= depth:
+            break
+        if row_depth == depth + 1:
+            children.append((name, cumulative))
+    return sorted(children, key=lambda item: item[1], reverse=True), rows[index][3]
+
+
+def run(repeat=5, top=15, raw=None):
+    best = None
+    for _ in range(repeat):
+        rows, eager, log = import_once()
+        children, total = app2_children(rows)
+        if best is None or total < best["app2_ms"] * 1000:
+            best = {"app2_ms": total / 1000, "children": children, "eager": eager, "log": log}
+
+    print(f"import app2: {best['app2_ms']:.0f} ms (best of {repeat})\n")
+    print(f"{'module':<40}{'cumulative':>12}")
+    print("-" * 52)
+    for name, cumulative in best["children"][:top]:
+        print(f"{name:<40}{cumulative / 1000:>9.1f} ms")
+    if raw:
+        with open(raw, "w", encoding="utf-8") as f:
+            f.write(best["log"])
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="how many of app2's imports to list")
+    parser.add_argument("--raw", help="write the best run's -X importtime log to this file")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown before the check fails, as a fraction of the baseline")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    best = run(args.repeat, args.top, args.raw)
+    failures = [f"{name} is imported when app2 loads; it should load on first use" for name in best["eager"]]
+
+    if args.save_baseline:
+        if failures:
+            parser.error("; ".join(failures))
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump({
+                "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                            "cpus": os.cpu_count()},
+                "app2_ms": round(best["app2_ms"], 1),
+                "children_ms": {name: round(us / 1000, 1) for name, us in best["children"][:args.top]},
+            }, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {os.path.relpath(BASELINE_PATH)}")
+        return
+
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if best["app2_ms"] > baseline["app2_ms"] * (1 + args.tolerance):
+            failures.append(f"import app2 took {best['app2_ms']:.0f} ms vs baseline {baseline['app2_ms']:.0f} ms")
+    else:
+        print("\nNo baseline yet; run with --save-baseline to record one.")
+
+    if failures:
+        print("\nRegressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nNo import-time regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compare PDF text normalisation against the original re.sub chain.
+
+Extracts the pages of every corpus PDF once, then times the original
+cleanup and text_normalize.normalize_pages on them (best of N). The
+running-header CV is also repeated to a few hundred and a thousand pages
+to show how both scale on large documents. Besides the time, it counts
+what each left behind: "Page X of Y" lines, copies of the running header
+and the number of output lines (the original collapsed each page to one).
+
+    python -m benchmarks.bench_normalize [--repeat 5] [--scale 5,25]
+"""
+import argparse
+import glob
+import os
+import re
+import time
+
+from pdf_extract import read_pdf_pages
+from text_normalize import normalize_pages
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PDF_DIR = os.path.join(HERE, "corpus", "pdf")
+HEADER = "Jane Doe - Curriculum Vitae"  # cv_40p's running header, see make_corpus
+PAGE_OF_RE = re.compile(r"Page \d+ of \d+")
+
+
+def legacy_format(page_texts):
+    """The cleanup as it was before text_normalize, kept as the baseline."""
+    pages = []
+    for page_text in page_texts:
+        pages.append(re.sub(r'\s+', ' ', page_text))
+    text = "\n\n".join(pages)
+    text = text.strip()
+    text = re.sub(r'\n\s*\d+\s*\n', '\n', text)
+    text = re.sub(r'\n\s*Page \d+ of \d+\s*\n', '\n', text)
+    text = re.sub(r'(\w+)-\n(\w+)', r'\1\2', text)
+    return text
+
+
+def best_of(fn, pages, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(pages)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def load_documents(scales):
+    documents = {}
+    for path in sorted(glob.glob(os.path.join(PDF_DIR, "*.pdf"))):
+        with open(path, "rb") as f:
+            documents[os.path.basename(path)] = read_pdf_pages(f.read())
+    cv = documents.get("cv_40p.pdf")
+    if cv:
+        for scale in scales:
+            documents[f"cv_40p.pdf x{scale}"] = cv * scale
+    return documents
+
+
+def leftovers(text):
+    """(page numbers, running headers, lines) in normalised text."""
+    return len(PAGE_OF_RE.findall(text)), text.count(HEADER), len(text.splitlines())
+
+
+def run(repeat=5, scales=(5, 25)):
+    documents = load_documents(scales)
+    header = (f"{'document':<20}{'pages':>6}{'KB':>7}{'legacy':>12}{'normalize':>12}{'speed-up':>10}"
+              f"{'page nums':>12}{'headers':>12}{'lines':>14}")
+    print(header)
+    print("-" * len(header))
+    for name, pages in documents.items():
+        size = sum(len(page) for page in pages)
+        legacy = best_of(legacy_format, pages, repeat)
+        new = best_of(normalize_pages, pages, repeat)
+        old_left, new_left = leftovers(legacy_format(pages)), leftovers(normalize_pages(pages))
+        print(f"{name:<20}{len(pages):>6}{size / 1024:>7.0f}{legacy * 1000:>9.1f} ms{new * 1000:>9.1f} ms"
+              f"{legacy / new:>9.2f}x"
+              + "".join(f"{f'{before}->{after}':>{width}}"
+                        for before, after, width in zip(old_left, new_left, (12, 12, 14))))
+    print("\npage nums / headers: 'Page X of Y' lines and running headers left in the text (legacy->new)")
+    print("lines: lines in the output text")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", default="5,25", help="comma-separated copies of the 40-page CV to time")
+    args = parser.parse_args()
+    run(args.repeat, [int(scale) for scale in args.scale.split(",") if scale])
+
+
+if __name__ == "__main__":
+    main()
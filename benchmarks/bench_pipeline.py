@@ -0,0 +1,313 @@
+"""Benchmark the upload, job-posting and generation paths against the checked-in corpus.
+
+Runs ``parse_file_contents`` and ``extract_pdf_text`` on the PDFs in
+corpus/pdf, ``extract_job_description_from_url`` on the pages in corpus/html
+(served by a local HTTP server) and ``generate_adapted_cover_letter`` with
+the responses in corpus/responses replayed by a fake model. Result, posting
+and PDF page caches are disabled so every call does the full work.
+
+For each case it reports the best, median and p95 latency, throughput with
+``--concurrency`` threads and the peak Python heap of a single call
+(tracemalloc). ``--save-baseline`` writes the numbers to
+baselines/pipeline.json; later runs compare against that file and exit
+non-zero when a case got slower or bigger than ``--tolerance`` allows.
+Baselines are machine specific, so record them on the machine that checks
+them.
+
+    python -m benchmarks.bench_pipeline [--repeat 7] [--concurrency 8] [--only url]
+    python -m benchmarks.bench_pipeline --save-baseline
+    GOOGLE_API_KEY=... python -m benchmarks.bench_pipeline --record
+
+The checked-in responses are synthetic: hand-written letters with made-up
+latencies, marked ``"synthetic": true``. ``--record`` replaces them with real
+Gemini answers and their measured latencies and clears the flag.
+"""
+import argparse
+import base64
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+# The fake model has to be routed before app2 builds its router
+REPLAY_ROUTES = {"default": ["stub:standard"], "concise": ["stub:concise"], "revision": ["stub:concise"]}
+os.environ.setdefault("CLG_MODEL_ROUTES", json.dumps(REPLAY_ROUTES))
+
+import app2  # noqa: E402
+import pdf_extract  # noqa: E402
+from cache import LRUCache, TieredCache  # noqa: E402
+from model_router import StubBackend  # noqa: E402
+from benchmarks.corpus_server import HTML_DIR, serve_corpus  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(HERE, "corpus")
+PDF_DIR = os.path.join(CORPUS_DIR, "pdf")
+RESPONSES_DIR = os.path.join(CORPUS_DIR, "responses")
+BASELINE_PATH = os.path.join(HERE, "baselines", "pipeline.json")
+
+# Fixed inputs for the generation cases
+JOB_PAGE = "board_medium.html"
+LETTER_PDF = "letter_1p.pdf"
+
+
+class ReplayBackend(StubBackend):
+    """Answers with the recorded response for the model name, after its recorded latency times `scale`."""
+
+    def __init__(self, responses, scale=0.0):
+        super().__init__(chunk_words=8)
+        self.responses = responses
+        self.scale = scale
+
+    def _letter(self, model, prompt):
+        return self.responses[model]["text"]
+
+    def generate(self, api_key, model, prompt):
+        time.sleep(self.responses[model]["latency_seconds"] * self.scale)
+        return super().generate(api_key, model, prompt)
+
+    def stream(self, api_key, model, prompt):
+        time.sleep(self.responses[model]["latency_seconds"] * self.scale)
+        yield from super().stream(api_key, model, prompt)
+
+
+def load_responses():
+    responses = {}
+    for path in sorted(glob.glob(os.path.join(RESPONSES_DIR, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            responses[os.path.splitext(os.path.basename(path))[0]] = json.load(f)
+    return responses
+
+
+def _data_url(data, mime):
+    return f"data:{mime};base64," + base64.b64encode(data).decode("ascii")
+
+
+def _pdf_variants(name, count):
+    # A trailing comment makes each copy hash differently, so concurrent workers don't share a parse
+    with open(os.path.join(PDF_DIR, name), "rb") as f:
+        data = f.read()
+    return [_data_url(data + f"%variant {i}\n".encode(), "application/pdf") for i in range(count)]
+
+
+def disable_caches():
+    """Make every cache on the measured paths store nothing."""
+    app2.result_cache = TieredCache(LRUCache(max_entries=0))
+    app2.posting_cache = TieredCache(LRUCache(max_entries=0))
+    pdf_extract._page_cache = LRUCache(max_entries=0)
+
+
+def build_cases(base_url, workers, only=None):
+    """Return {name: fn(worker)}; each worker index gets its own copy of the input."""
+    cases = {}
+    for path in sorted(glob.glob(os.path.join(PDF_DIR, "*.pdf"))):
+        name = os.path.basename(path)
+        variants = _pdf_variants(name, workers)
+        cases[f"parse_file_contents/{name}"] = lambda w, v=variants, n=name: app2.parse_file_contents(v[w], n)
+        cases[f"extract_pdf_text/{name}"] = lambda w, v=variants, n=name: app2.extract_pdf_text(v[w], n)
+
+    for path in sorted(glob.glob(os.path.join(HTML_DIR, "*.html"))):
+        url = f"{base_url}/{os.path.basename(path)}"
+        cases[f"extract_job_description_from_url/{os.path.basename(path)}"] = (
+            lambda w, u=url: _expect_text(app2.extract_job_description_from_url(u))
+        )
+
+    job_description, _ = app2.extract_job_description_from_url(f"{base_url}/{JOB_PAGE}")
+    letter = app2.extract_pdf_text(_pdf_variants(LETTER_PDF, 1)[0], LETTER_PDF)
+    for length in ("concise", "moderate"):
+        cases[f"generate_adapted_cover_letter/{length}"] = (
+            lambda w, l=length: _expect_ok(app2.generate_adapted_cover_letter(
+                job_description, letter, "bench-key", "professional", l, "skills"))
+        )
+
+    if only:
+        cases = {name: fn for name, fn in cases.items() if any(term in name for term in only)}
+    return cases
+
+
+def _expect_text(result):
+    text, message = result
+    if text is None:
+        raise AssertionError(message)
+    return text
+
+
+def _expect_ok(result):
+    if not result.ok:
+        raise AssertionError(result.error)
+    return result.text
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def measure(fn, repeat, concurrency, calls_per_worker):
+    fn(0)  # Warm up imports, pools and connections
+
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(0)
+        times.append(time.perf_counter() - started)
+
+    errors = []
+
+    def worker(w):
+        try:
+            for _ in range(calls_per_worker):
+                fn(w)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise errors[0]
+
+    tracemalloc.start()
+    try:
+        fn(0)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "best_ms": min(times) * 1000,
+        "median_ms": statistics.median(times) * 1000,
+        "p95_ms": _percentile(times, 0.95) * 1000,
+        "ops_per_sec": concurrency * calls_per_worker / elapsed,
+        "peak_kb": peak / 1024,
+    }
+
+
+def compare(results, baseline, tolerance, memory_tolerance):
+    """Return a list of regression messages against the baseline results."""
+    failures = []
+    for name, row in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        # Best-of-N is compared because medians on a shared machine swing with its load
+        if row["best_ms"] > base["best_ms"] * (1 + tolerance):
+            failures.append(f"{name}: best {row['best_ms']:.1f} ms vs baseline {base['best_ms']:.1f} ms")
+        if row["ops_per_sec"] < base["ops_per_sec"] / (1 + tolerance):
+            failures.append(f"{name}: {row['ops_per_sec']:.1f} ops/s vs baseline {base['ops_per_sec']:.1f} ops/s")
+        if row["peak_kb"] > base["peak_kb"] * (1 + memory_tolerance):
+            failures.append(f"{name}: peak {row['peak_kb']:.0f} KB vs baseline {base['peak_kb']:.0f} KB")
+    return failures
+
+
+def run(repeat=7, concurrency=8, calls_per_worker=3, model_latency=0.0, only=None):
+    responses = load_responses()
+    synthetic = sorted(name for name, fixture in responses.items() if fixture.get("synthetic"))
+    if synthetic:
+        print(f"Replaying synthetic model responses ({', '.join(synthetic)}): hand-written text and "
+              f"latencies, not recorded answers (see --record)\n")
+    app2.model_router.backends["stub"] = ReplayBackend(responses, scale=model_latency)
+    disable_caches()
+    server, base_url = serve_corpus()
+    try:
+        cases = build_cases(base_url, max(concurrency, 1), only)
+        header = f"{'case':<56}{'best':>10}{'median':>10}{'p95':>10}{'ops/s':>9}{'peak':>10}"
+        print(header)
+        print("-" * len(header))
+        results = {}
+        for name, fn in cases.items():
+            row = results[name] = measure(fn, repeat, concurrency, calls_per_worker)
+            print(f"{name:<56}{row['best_ms']:>7.1f} ms{row['median_ms']:>7.1f} ms{row['p95_ms']:>7.1f} ms"
+                  f"{row['ops_per_sec']:>9.1f}{row['peak_kb']:>7.0f} KB")
+        return results
+    finally:
+        server.shutdown()
+
+
+def record(api_key):
+    """Replace the fixtures in corpus/responses with real answers from the models they name."""
+    server, base_url = serve_corpus()
+    try:
+        job_description, _ = app2.extract_job_description_from_url(f"{base_url}/{JOB_PAGE}")
+    finally:
+        server.shutdown()
+    letter = app2.extract_pdf_text(_pdf_variants(LETTER_PDF, 1)[0], LETTER_PDF)
+
+    for name, fixture in load_responses().items():
+        backend_name, _, model = fixture["model"].partition(":")
+        length = "concise" if name == "concise" else "moderate"
+        prompt, _ = app2.build_budgeted_prompt(job_description, letter, "professional", length, "skills")
+        started = time.perf_counter()
+        text = app2.model_router.backends[backend_name].generate(api_key, model, prompt)
+        fixture.update(synthetic=False, latency_seconds=round(time.perf_counter() - started, 2), text=text.strip())
+        with open(os.path.join(RESPONSES_DIR, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(fixture, f, indent=2)
+            f.write("\n")
+        print(f"{name}: {fixture['model']} answered in {fixture['latency_seconds']} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=3, help="calls per thread in the throughput run")
+    parser.add_argument("--model-latency", type=float, default=0.0,
+                        help="scale applied to the recorded model latencies (1 = as recorded)")
+    parser.add_argument("--only", action="append", help="run cases whose name contains this (repeatable)")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed slowdown before a case fails, as a fraction of the baseline")
+    parser.add_argument("--memory-tolerance", type=float, default=0.25)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--record", action="store_true", help="re-record corpus/responses (needs GOOGLE_API_KEY)")
+    args = parser.parse_args()
+
+    if args.record:
+        api_key = os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            parser.error("--record needs GOOGLE_API_KEY in the environment")
+        record(api_key)
+        return
+
+    results = run(args.repeat, args.concurrency, args.calls, args.model_latency, args.only)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump({
+                "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                            "cpus": os.cpu_count()},
+                "settings": {"concurrency": args.concurrency, "model_latency": args.model_latency},
+                "results": {name: {k: round(v, 3) for k, v in row.items()} for name, row in results.items()},
+            }, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nBaseline written to {os.path.relpath(BASELINE_PATH)}")
+        return
+
+    if not os.path.exists(BASELINE_PATH):
+        print("\nNo baseline yet; run with --save-baseline to record one.")
+        return
+    with open(BASELINE_PATH, encoding="utf-8") as f:
+        baseline = json.load(f)
+    settings = {"concurrency": args.concurrency, "model_latency": args.model_latency}
+    if baseline["settings"] != settings:
+        print(f"\nNot compared: the baseline was recorded with {baseline['settings']}.")
+        return
+    failures = compare(results, baseline["results"], args.tolerance, args.memory_tolerance)
+    if failures:
+        print("\nRegressions against the baseline:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print(f"\nNo regressions against the baseline (tolerance {args.tolerance:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
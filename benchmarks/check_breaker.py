@@ -0,0 +1,80 @@
+"""Check that a caller-side error during a half-open trial doesn't wedge the circuit.
+
+For both LLMGuard.call and LLMGuard.stream: a 503 opens the model's
+breaker, the cooldown passes, the half-open trial fails with a
+non-server error (a rejected key, a bad request, an unknown error), and
+the next call must be let through and close the circuit again. Exits
+non-zero if any sequence ends anywhere else.
+
+    python -m benchmarks.check_breaker
+"""
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+from rate_limit import AUTH, CIRCUIT_OPEN, INVALID_REQUEST, UNKNOWN, LLMError, LLMGuard  # noqa: E402
+
+COOLDOWN = 0.05
+
+
+class StatusError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+TRIAL_ERRORS = {AUTH: StatusError(401), INVALID_REQUEST: StatusError(400), UNKNOWN: RuntimeError("blocked")}
+
+
+def _raise(exc):
+    raise exc
+
+
+def via_call(guard, exc):
+    return guard.call("key", "model", (lambda: _raise(exc)) if exc else (lambda: "ok"))
+
+
+def via_stream(guard, exc):
+    return "".join(guard.stream("key", "model", (lambda: _raise(exc)) if exc else (lambda: iter(["o", "k"]))))
+
+
+def sequence(path, trial_error):
+    """Return the breaker states seen along 503 -> cooldown -> trial error -> success."""
+    guard = LLMGuard(failure_threshold=1, cooldown=COOLDOWN, max_retries=0, backoff_base=0)
+    breaker = guard.breaker("model")
+    states = []
+    for exc, expected in ((StatusError(503), None), (trial_error, None), (None, "ok")):
+        if exc is trial_error:
+            time.sleep(COOLDOWN * 2)
+        states.append(breaker.state)
+        try:
+            result = path(guard, exc)
+        except LLMError as e:
+            if e.kind == CIRCUIT_OPEN:
+                return states + ["rejected"]
+            result = None
+        if result != expected:
+            return states + [f"returned {result!r}"]
+    return states + [breaker.state]
+
+
+def main():
+    failures = []
+    for path in (via_call, via_stream):
+        for kind, trial_error in TRIAL_ERRORS.items():
+            states = sequence(path, trial_error)
+            print(f"{path.__name__:<12}{kind:<17}{' -> '.join(states)}")
+            if states != ["closed", "half_open", "half_open", "closed"]:
+                failures.append(f"{path.__name__} with an {kind} trial: {' -> '.join(states)}")
+    if failures:
+        print("\nFailures:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("Every circuit closed again after a caller-side error in the half-open trial.")
+
+
+if __name__ == "__main__":
+    main()
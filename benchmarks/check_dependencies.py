@@ -0,0 +1,88 @@
+"""Check that serving uploads doesn't add callbacks to the Dash app.
+
+Every page load downloads ``/_dash-dependencies``, the app's whole callback
+graph, so a callback registered at request time makes every later page load
+bigger (and can replace a server callback with a clientside one). This runs
+app2 in-process, records the payload size and callback count, sends
+``--uploads`` PDFs through /upload and the upload callback, then checks
+both numbers again. Exits non-zero if either changed or an upload callback
+failed.
+
+    python -m benchmarks.check_dependencies [--uploads 20]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+PDF_PATH = os.path.join(HERE, "corpus", "pdf", "letter_1p.pdf")
+
+# Nothing here generates, but keep the app from ever reaching a real model
+os.environ.setdefault("CLG_MODEL_ROUTES", json.dumps({"default": ["stub:offline"]}))
+
+sys.path.insert(0, ROOT)
+import app2  # noqa: E402
+from benchmarks.load_test import DashClient, _find_store  # noqa: E402
+
+
+def graph_size(base_url):
+    """(bytes of /_dash-dependencies, number of registered callbacks)."""
+    response = requests.get(f"{base_url}/_dash-dependencies", timeout=30)
+    response.raise_for_status()
+    return len(response.content), len(app2.app.callback_map)
+
+
+def upload(client, session_id, pdf):
+    handle = client.upload("letter.pdf", pdf, session_id)
+    client.call("pdf-upload-status.children", "pdf-upload-handle",
+                {"pdf-upload-handle": handle}, {"session-id": session_id})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=20)
+    args = parser.parse_args()
+
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app2.server, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    with open(PDF_PATH, "rb") as f:
+        pdf = f.read()
+
+    try:
+        before = graph_size(base_url)
+        client = DashClient.connect(base_url)
+        session_id = _find_store(client.layout(), "session-id")
+        failures = []
+        for number in range(args.uploads):
+            try:
+                upload(client, session_id, pdf)
+            except Exception as e:
+                failures.append(f"upload {number + 1}: {type(e).__name__}: {e}")
+        after = graph_size(base_url)
+    finally:
+        server.shutdown()
+
+    print(f"/_dash-dependencies: {before[0]} bytes, {before[1]} callbacks before "
+          f"{args.uploads} uploads; {after[0]} bytes, {after[1]} callbacks after")
+    if after != before:
+        failures.insert(0, "the callback graph changed while serving uploads")
+    if failures:
+        print("\nFailures:")
+        for failure in failures[:10]:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("The callback graph is unchanged.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Serve the saved job-board pages in benchmarks/corpus/html over local HTTP."""
+import http.server
+import os
+import threading
+import urllib.parse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HTML_DIR = os.path.join(HERE, "corpus", "html")
+
+
+class _CorpusHandler(http.server.BaseHTTPRequestHandler):
+    # No Last-Modified/ETag, so every fetch transfers the whole page
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; Nagle would hold the body for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        # Query strings are ignored, so ?n=... gives distinct URLs for the same page
+        path = os.path.join(HTML_DIR, os.path.basename(urllib.parse.urlsplit(self.path).path))
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_corpus(host="127.0.0.1", port=0):
+    """Serve corpus/html on a background thread; returns (server, base_url)."""
+    server = http.server.ThreadingHTTPServer((host, port), _CorpusHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
@@ -0,0 +1,442 @@
+"""Drive the Dash callback endpoints with concurrent virtual users.
+
+Each virtual user goes through what the browser does for one letter: load
+the layout, save an API key, stream a PDF to /upload and run the upload
+callbacks, use the extracted text, import a job posting from a URL, click
+Generate and poll the job every 500 ms until it finishes. Requests go to the real
+``/_dash-update-component`` endpoint, so routing, serialisation, the job
+queue and the session store are all exercised.
+
+By default the app is started in a subprocess for every ``--job-workers``
+setting, with the offline stub model answering after ``--llm-latency``
+seconds, and job pages served from benchmarks/corpus/html. Every user
+imports its own URL and sends its own letter, so the posting and result
+caches don't answer for it. ``--server`` picks what runs the app: the
+threaded werkzeug server, or serve.py's gunicorn workers as ``sync``,
+``gthread[:threads]`` or ``gevent``; several comma-separated values are
+compared one after the other. ``--url`` points the driver at a server you
+started yourself instead.
+
+    python -m benchmarks.load_test --users 20 --duration 60 --job-workers 4,8,16 --llm-latency 3
+    python -m benchmarks.load_test --rate 2 --users 50 --duration 60   # open model: 2 new users/s
+    python -m benchmarks.load_test --users 40 --job-workers 32 --server sync,gthread:16,gevent
+
+Without ``--rate`` each user starts its next letter as soon as the last one
+finishes (closed model). With it, users arrive at that mean rate and at
+most ``--users`` are active at once.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from benchmarks.corpus_server import serve_corpus
+from uploads import SESSION_HEADER
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+PDF_PATH = os.path.join(HERE, "corpus", "pdf", "letter_1p.pdf")
+JOB_PAGE = "board_medium.html"
+POLL_INTERVAL = 0.5  # generation-poll's interval in the layout
+
+STEPS = ("layout", "save_key", "upload", "upload_callbacks", "use_text", "url_extract", "generate",
+         "poll", "generation", "session")
+
+
+class Stats:
+    """Latencies and errors per step, shared by all virtual users."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = {}
+
+    def record(self, step, seconds):
+        with self._lock:
+            self.latencies[step].append(seconds)
+
+    def error(self, step, message):
+        with self._lock:
+            self.errors[step] += 1
+            self.error_samples.setdefault(step, message)
+
+    def summary(self, elapsed):
+        rows = {}
+        for step in STEPS:
+            values = sorted(self.latencies.get(step, []))
+            errors = self.errors.get(step, 0)
+            if not values and not errors:
+                continue
+            rows[step] = {
+                "ok": len(values),
+                "errors": errors,
+                "error_rate": errors / (len(values) + errors),
+                "per_sec": len(values) / elapsed,
+                "p50_ms": _percentile(values, 0.50) * 1000,
+                "p90_ms": _percentile(values, 0.90) * 1000,
+                "p99_ms": _percentile(values, 0.99) * 1000,
+                "max_ms": (values[-1] if values else 0) * 1000,
+            }
+        return rows
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+class DashClient:
+    """Builds ``_dash-update-component`` requests from the app's ``_dash-dependencies``."""
+
+    def __init__(self, base_url, dependencies):
+        self.base_url = base_url
+        self.dependencies = dependencies
+        self.session = requests.Session()
+
+    @classmethod
+    def connect(cls, base_url):
+        dependencies = requests.get(f"{base_url}/_dash-dependencies", timeout=30).json()
+        return cls(base_url, dependencies)
+
+    def _callback(self, first_output, trigger):
+        # Callbacks are identified by their first output and triggering input; outputs that allow
+        # duplicates carry an "@<hash>" suffix
+        for dep in self.dependencies:
+            first = dep["output"].strip(".").split("...")[0].split("@")[0]
+            if first == first_output and any(spec["id"] == trigger for spec in dep["inputs"]):
+                return dep
+        raise KeyError(f"No callback from {trigger} to {first_output}")
+
+    def call(self, first_output, trigger, inputs, state=None, timeout=60):
+        """Fire the callback whose first output is ``first_output``, triggered by input id ``trigger``."""
+        dep = self._callback(first_output, trigger)
+        state = state or {}
+        outputs = []
+        for spec in dep["output"].strip(".").split("..."):
+            component_id, prop = spec.split("@")[0].rsplit(".", 1)
+            outputs.append({"id": component_id, "property": prop})
+        multi = dep["output"].startswith("..")
+        body = {
+            "output": dep["output"],
+            "outputs": outputs if multi else outputs[0],
+            "inputs": [dict(spec, value=inputs.get(spec["id"])) for spec in dep["inputs"]],
+            "state": [dict(spec, value=state.get(spec["id"])) for spec in dep["state"]],
+            "changedPropIds": [f"{trigger}.{next(i['property'] for i in dep['inputs'] if i['id'] == trigger)}"],
+        }
+        response = self.session.post(f"{self.base_url}/_dash-update-component", json=body, timeout=timeout)
+        if response.status_code == 204:
+            return {}
+        response.raise_for_status()
+        return response.json()["response"]
+
+    def layout(self):
+        response = self.session.get(f"{self.base_url}/_dash-layout", timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def upload(self, filename, data, session_id):
+        response = self.session.post(f"{self.base_url}/upload", params={"filename": filename}, data=data,
+                                     headers={"Content-Type": "application/pdf", SESSION_HEADER: session_id},
+                                     timeout=60)
+        response.raise_for_status()
+        return response.json()
+
+
+def _find_store(tree, component_id):
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if node.get("props", {}).get("id") == component_id:
+                return node["props"].get("data")
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return None
+
+
+def _is_error(children):
+    # Errors are rendered as html.Span(..., className="text-danger")
+    return isinstance(children, dict) and "text-danger" in str(children.get("props", {}).get("className", ""))
+
+
+class StepFailed(Exception):
+    pass
+
+
+def _timed(stats, step, fn):
+    started = time.perf_counter()
+    try:
+        result = fn()
+    except Exception as e:
+        stats.error(step, f"{type(e).__name__}: {e}")
+        raise StepFailed(step)
+    stats.record(step, time.perf_counter() - started)
+    return result
+
+
+def run_session(client, stats, job_url, pdf, number, generation_timeout):
+    """One virtual user's way through the app; step failures are counted and end the session."""
+    started = time.perf_counter()
+    try:
+        layout = _timed(stats, "layout", client.layout)
+        session_id = _find_store(layout, "session-id")
+
+        _timed(stats, "save_key", lambda: client.call(
+            "api-key-status.children", "save-api-key", {"save-api-key": 1},
+            {"api-key": "load-test-key", "session-id": session_id}))
+
+        handle = _timed(stats, "upload", lambda: client.upload("letter.pdf", pdf, session_id))
+
+        def upload_callbacks():
+            response = client.call("pdf-upload-status.children", "pdf-upload-handle",
+                                   {"pdf-upload-handle": handle}, {"session-id": session_id})
+            return response["extracted-cover-letter"]["data"]
+
+        extracted = _timed(stats, "upload_callbacks", upload_callbacks)
+
+        letter = _timed(stats, "use_text", lambda: client.call(
+            "original-cover-letter.value", "use-pdf-text-btn", {"use-pdf-text-btn": 1},
+            {"extracted-cover-letter": extracted, "session-id": session_id},
+        )["original-cover-letter"]["value"])
+        # A distinct letter per session, so the result cache doesn't answer for it
+        letter = f"{letter}\n\nReference: load test session {number}"
+
+        def url_extract():
+            response = client.call("job-description.value", "extract-url-btn", {"extract-url-btn": 1},
+                                   {"job-url": f"{job_url}?session={number}"})
+            job_description = response.get("job-description", {}).get("value")
+            if not job_description:
+                raise RuntimeError(json.dumps(response.get("url-extraction-status"))[:200])
+            return job_description
+
+        job_description = _timed(stats, "url_extract", url_extract)
+
+        clicked = time.perf_counter()
+
+        def generate():
+            response = client.call("loading-indicator.style", "generate-btn", {"generate-btn": 1}, {
+                "job-description": job_description, "original-cover-letter": letter,
+                "session-id": session_id, "tone-dropdown": "professional",
+                "length-dropdown": "moderate", "focus-dropdown": "skills",
+            })
+            job_id = response.get("generation-job", {}).get("data")
+            if not job_id:
+                raise RuntimeError(json.dumps(response.get("generation-time"))[:200])
+            return job_id
+
+        job_id = _timed(stats, "generate", generate)
+
+        def generation():
+            for n in itertools.count(1):
+                if time.perf_counter() - clicked > generation_timeout:
+                    raise TimeoutError(f"not finished after {generation_timeout:.0f}s")
+                time.sleep(POLL_INTERVAL)
+                response = _timed(stats, "poll", lambda: client.call(
+                    "generated-cover-letter.value", "generation-poll", {"generation-poll": n},
+                    {"generation-job": job_id, "session-id": session_id}))
+                if response.get("generation-poll", {}).get("disabled"):
+                    status = response.get("generation-time", {}).get("children")
+                    if _is_error(status):
+                        raise RuntimeError(json.dumps(status)[:200])
+                    return
+
+        try:
+            generation()
+        except StepFailed:
+            raise
+        except Exception as e:
+            stats.error("generation", f"{type(e).__name__}: {e}")
+            raise StepFailed("generation")
+        stats.record("generation", time.perf_counter() - clicked)
+    except StepFailed:
+        stats.error("session", "a step failed")
+        return
+    stats.record("session", time.perf_counter() - started)
+
+
+def drive(base_url, job_url, users, duration, rate=None, generation_timeout=120, seed=0):
+    """Run virtual users against base_url for `duration` seconds and return (summary, elapsed)."""
+    client_template = DashClient.connect(base_url)
+    with open(PDF_PATH, "rb") as f:
+        pdf = f.read()
+    stats = Stats()
+    numbers = itertools.count()
+    deadline = time.perf_counter() + duration
+    rng = random.Random(seed)
+    slots = threading.BoundedSemaphore(users)
+    threads = []
+
+    def closed_user():
+        client = DashClient(base_url, client_template.dependencies)
+        while time.perf_counter() < deadline:
+            run_session(client, stats, job_url, pdf, next(numbers), generation_timeout)
+
+    def open_user():
+        try:
+            run_session(DashClient(base_url, client_template.dependencies), stats, job_url, pdf,
+                        next(numbers), generation_timeout)
+        finally:
+            slots.release()
+
+    started = time.perf_counter()
+    if rate is None:
+        threads = [threading.Thread(target=closed_user, daemon=True) for _ in range(users)]
+        for thread in threads:
+            thread.start()
+    else:
+        next_arrival = started
+        while next_arrival < deadline:
+            time.sleep(max(0.0, next_arrival - time.perf_counter()))
+            if not slots.acquire(blocking=False):
+                # Every user slot is busy; an arrival that can't start counts as dropped
+                stats.error("session", "dropped: all virtual users busy")
+            else:
+                thread = threading.Thread(target=open_user, daemon=True)
+                thread.start()
+                threads.append(thread)
+            next_arrival += rng.expovariate(rate)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return stats, elapsed
+
+
+def start_server(port, job_workers, max_pending, llm_latency, chunk_delay, server="werkzeug"):
+    """Start app2's server in a subprocess with the stub model; returns the Popen."""
+    command = [sys.executable, "-m", "benchmarks.load_test", "--serve", str(port)]
+    launcher = {}
+    if server != "werkzeug":
+        worker_class, _, threads = server.partition(":")
+        command = [sys.executable, "serve.py"]
+        launcher = {"CLG_BIND": f"127.0.0.1:{port}", "CLG_WORKER_CLASS": worker_class}
+        if threads:
+            launcher["CLG_THREADS"] = threads
+    env = dict(
+        os.environ,
+        CLG_MODEL_ROUTES=json.dumps({"default": ["stub:load-test"]}),
+        CLG_STUB_LATENCY=str(llm_latency),
+        CLG_STUB_CHUNK_DELAY=str(chunk_delay),
+        CLG_JOB_WORKERS=str(job_workers),
+        CLG_JOB_MAX_PENDING=str(max_pending),
+        **launcher,
+    )
+    # Server output goes to a file; an unread pipe would fill up and stall the server
+    log = tempfile.TemporaryFile()
+    process = subprocess.Popen(
+        command,
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        if process.poll() is not None:
+            log.seek(0)
+            raise RuntimeError(f"Server exited: {log.read().decode(errors='replace')[-2000:]}")
+        try:
+            if requests.get(f"{base_url}/_dash-layout", timeout=1).status_code == 200:
+                return process
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Server did not come up within 30 seconds")
+
+
+def serve(port):
+    """Run app2's Flask server with a thread per request (the --serve subprocess)."""
+    from werkzeug.serving import make_server
+
+    sys.path.insert(0, ROOT)
+    import app2
+
+    # One access log line per poll would cost more than some of the requests being measured
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    make_server("127.0.0.1", port, app2.server, threaded=True).serve_forever()
+
+
+def print_report(label, summary, elapsed):
+    print(f"\n{label} ({elapsed:.0f}s)")
+    header = f"{'step':<18}{'ok':>7}{'err %':>8}{'per s':>8}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}"
+    print(header)
+    print("-" * len(header))
+    for step, row in summary.items():
+        print(f"{step:<18}{row['ok']:>7}{row['error_rate'] * 100:>7.1f}%{row['per_sec']:>8.2f}"
+              + "".join(f"{row[key]:>7.0f} ms" for key in ("p50_ms", "p90_ms", "p99_ms", "max_ms")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users (max active with --rate)")
+    parser.add_argument("--rate", type=float, help="new users per second (open model)")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to start new sessions for")
+    parser.add_argument("--job-workers", default="8", help="comma-separated CLG_JOB_WORKERS values to compare")
+    parser.add_argument("--max-pending", type=int, default=32, help="CLG_JOB_MAX_PENDING for started servers")
+    parser.add_argument("--llm-latency", type=float, default=2.0, help="seconds before the stub model answers")
+    parser.add_argument("--chunk-delay", type=float, default=0.05, help="seconds between streamed chunks")
+    parser.add_argument("--generation-timeout", type=float, default=120)
+    parser.add_argument("--server", default="werkzeug",
+                        help="comma-separated servers to compare: werkzeug, sync, gthread[:threads], gevent")
+    parser.add_argument("--port", type=int, default=8077)
+    parser.add_argument("--url", help="drive an already running server instead of starting one")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    corpus, corpus_url = serve_corpus()
+    job_url = f"{corpus_url}/{JOB_PAGE}"
+    results = {}
+    try:
+        if args.url:
+            configs = [("server at " + args.url, None, None)]
+        else:
+            configs = [(f"{server}, job workers={workers}", int(workers), server)
+                       for server in args.server.split(",") for workers in args.job_workers.split(",")]
+        for label, workers, server in configs:
+            process = None
+            base_url = args.url
+            if workers is not None:
+                process = start_server(args.port, workers, args.max_pending, args.llm_latency, args.chunk_delay,
+                                       server)
+                base_url = f"http://127.0.0.1:{args.port}"
+            try:
+                stats, elapsed = drive(base_url, job_url, args.users, args.duration, args.rate,
+                                       args.generation_timeout)
+            finally:
+                if process is not None:
+                    # gunicorn drains in-flight generations before its workers exit
+                    process.terminate()
+                    process.wait(timeout=120)
+            summary = stats.summary(elapsed)
+            print_report(label, summary, elapsed)
+            for step, message in stats.error_samples.items():
+                print(f"  first {step} error: {message}")
+            results[label] = {"elapsed": elapsed, "steps": summary}
+    finally:
+        corpus.shutdown()
+
+    if args.json:
+        settings = {k: v for k, v in vars(args).items() if k not in ("json", "serve")}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
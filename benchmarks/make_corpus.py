@@ -0,0 +1,183 @@
+"""Regenerate the synthetic corpus in benchmarks/corpus.
+
+The HTML pages mimic what large job boards serve: a navigation bar, cookie
+banner, inline JSON state and tracking scripts, a deep tree of styled divs,
+the description container, and a long "similar jobs" list. The PDFs are
+cover letters and a long CV with a running header and page numbers, written
+with a minimal PDF writer so no PDF library is needed. Output is
+deterministic so the checked-in corpus can be rebuilt byte for byte.
+
+    python -m benchmarks.make_corpus
+"""
+import json
+import os
+import random
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HTML_DIR = os.path.join(HERE, "corpus", "html")
+PDF_DIR = os.path.join(HERE, "corpus", "pdf")
+
+WORDS = (
+    "python engineer team platform design build scalable services data pipeline cloud "
+    "experience years ownership collaborate product customers reliability testing review "
+    "mentor distributed systems api latency performance kubernetes postgres analytics "
+    "remote hybrid benefits equity growth mission impact communication stakeholders"
+).split()
+
+REQUIREMENTS = [
+    "5+ years of professional Python experience",
+    "Experience designing REST and gRPC APIs",
+    "Strong knowledge of PostgreSQL and query tuning",
+    "Familiarity with Kubernetes and container orchestration",
+    "Excellent written and verbal communication skills",
+    "Experience mentoring junior engineers",
+    "Bachelor's degree in Computer Science or equivalent experience",
+]
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _paragraph(rng, sentences=5):
+    return " ".join(_sentence(rng, rng.randint(8, 18)) for _ in range(sentences))
+
+
+def _noise_block(rng, depth):
+    # Nested presentational divs with utility classes, like CSS-in-JS output
+    if depth == 0:
+        return f'<span class="css-{rng.randint(1000, 9999)}">{_sentence(rng, 6)}</span>'
+    inner = "".join(_noise_block(rng, depth - 1) for _ in range(2))
+    return f'<div class="css-{rng.randint(1000, 9999)} flex-row gap-{depth}">{inner}</div>'
+
+
+def build_page(seed, similar_jobs, noise_blocks, state_kb, layout="container", xhtml=False):
+    rng = random.Random(seed)
+    state = {"jobs": [{"id": i, "title": _sentence(rng, 4), "body": _paragraph(rng, 3)}
+                      for i in range(state_kb)]}
+    description = "".join(f"<p>{_paragraph(rng)}</p>" for _ in range(6))
+    requirements = "".join(f"<li>{item}</li>" for item in REQUIREMENTS)
+    body = (
+        f'<h1 class="job-title">Senior Python Engineer</h1>'
+        f'<h2>About the role</h2>{description}'
+        f'<h2>Requirements</h2><ul>{requirements}</ul>'
+    )
+    if layout == "container":
+        main = f'<div class="jobs-description__container JobDetails-module">{body}</div>'
+    elif layout == "main":
+        main = f"<main><article>{body}</article></main>"
+    else:
+        main = f"<div class='layout-body'>{body}</div>"
+
+    similar = "".join(
+        f'<li class="similar-job"><a href="/jobs/{i}">{_sentence(rng, 5)}</a>'
+        f'<span class="company">{rng.choice(WORDS).title()} Inc.</span></li>'
+        for i in range(similar_jobs)
+    )
+    noise = "".join(_noise_block(rng, 4) for _ in range(noise_blocks))
+    scripts = "".join(
+        f"<script>window.dataLayer.push({json.dumps({'event': 'view', 'n': i})});</script>"
+        for i in range(50)
+    )
+    # XHTML pages open with an XML declaration, which lxml rejects on decoded text
+    prolog = ('<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Strict//EN" '
+              '"http://www.w3.org/TR/xhtml1/DTD/xhtml1-strict.dtd"><html xmlns="http://www.w3.org/1999/xhtml">'
+              if xhtml else "<!DOCTYPE html><html>")
+    return (
+        f"{prolog}<head><title>Senior Python Engineer</title>"
+        "<style>.css-1{display:flex}.flex-row{flex-direction:row}</style>"
+        f"<script id='__STATE__' type='application/json'>{json.dumps(state)}</script>"
+        "</head><body>"
+        "<header><nav><a href='/'>Home</a><a href='/jobs'>Jobs</a><a href='/companies'>Companies</a></nav></header>"
+        "<div class='cookie-banner'>We use cookies to improve your experience. Accept all cookies?</div>"
+        f"{noise}{main}"
+        f"<aside><h3>Similar jobs</h3><ul>{similar}</ul></aside>"
+        f"{scripts}"
+        "<footer>Copyright Example Jobs. Terms. Privacy.</footer>"
+        "</body></html>"
+    )
+
+
+def _pdf_escape(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(pages):
+    """A PDF with one Helvetica text page per list of lines."""
+    count = len(pages)
+    font_id = 3 + 2 * count
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(count))}] /Count {count} >>",
+    ]
+    for i, lines in enumerate(pages):
+        content = "BT /F1 10 Tf 13 TL 60 750 Td " + " ".join(f"({_pdf_escape(line)}) Tj T*" for line in lines) + " ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>"
+        )
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def build_pdf(seed, pages, lines_per_page=48, header=None):
+    rng = random.Random(seed)
+    out = []
+    for number in range(1, pages + 1):
+        lines = [header] if header else []
+        while len(lines) < lines_per_page - 1:
+            # Wrapped prose with the odd hyphenated line break, as PDF text extraction returns it
+            line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(9, 13)))
+            lines.append(line + ("-" if rng.random() < 0.05 else ""))
+        lines.append(f"Page {number} of {pages}")
+        out.append(lines)
+    return write_pdf(out)
+
+
+PAGES = {
+    "board_small.html": dict(seed=1, similar_jobs=40, noise_blocks=10, state_kb=20),
+    "board_medium.html": dict(seed=2, similar_jobs=400, noise_blocks=120, state_kb=200),
+    "board_large.html": dict(seed=3, similar_jobs=1500, noise_blocks=500, state_kb=700),
+    "article_medium.html": dict(seed=4, similar_jobs=400, noise_blocks=120, state_kb=200, layout="main"),
+    "bare_medium.html": dict(seed=5, similar_jobs=400, noise_blocks=120, state_kb=200, layout="body"),
+    "xhtml_small.html": dict(seed=6, similar_jobs=40, noise_blocks=10, state_kb=20, xhtml=True),
+}
+
+
+PDFS = {
+    "letter_1p.pdf": dict(seed=11, pages=1, lines_per_page=30),
+    "letter_3p.pdf": dict(seed=12, pages=3),
+    # Above CLG_PDF_PARALLEL_THRESHOLD, so extraction is split across page ranges
+    "cv_40p.pdf": dict(seed=13, pages=40, header="Jane Doe - Curriculum Vitae"),
+}
+
+
+def main():
+    os.makedirs(HTML_DIR, exist_ok=True)
+    for name, params in PAGES.items():
+        html = build_page(**params)
+        with open(os.path.join(HTML_DIR, name), "w", encoding="utf-8", newline="\n") as f:
+            f.write(html)
+        print(f"{name}: {len(html) / 1024:.0f} KB")
+
+    os.makedirs(PDF_DIR, exist_ok=True)
+    for name, params in PDFS.items():
+        pdf = build_pdf(**params)
+        with open(os.path.join(PDF_DIR, name), "wb") as f:
+            f.write(pdf)
+        print(f"{name}: {len(pdf) / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
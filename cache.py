@@ -0,0 +1,257 @@
+"""Small caching primitives shared by the cover letter generator.
+
+Two tiers are provided: an in-process LRU (`LRUCache`) and an optional
+on-disk SQLite store with TTL and size-based eviction (`SQLiteCache`).
+Both can be bounded by entry count and by approximate payload bytes.
+The TTL counts from the last write, or with ``sliding=True`` from the last
+read or write (for session data that should live as long as it is used).
+`TieredCache` combines them and keeps hit/miss counters.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+def sizeof(value):
+    """Approximate payload size of a cached value in bytes (string lengths)."""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(sizeof(v) for v in value)
+    return 8
+
+
+def make_cache_key(*parts):
+    """Return a stable SHA-256 hex digest for a sequence of JSON-serialisable parts."""
+    payload = json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache bounded by entries and optionally bytes, with an optional TTL."""
+
+    def __init__(self, max_entries=256, ttl=None, max_bytes=None, sliding=False):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sliding = sliding
+        self.current_bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            value, stored_at, size = entry
+            now = time.time()
+            if self.ttl is not None and now - stored_at > self.ttl:
+                self._pop(key)
+                return default
+            if self.sliding:
+                self._data[key] = (value, now, size)
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # Would evict everything else and still not fit
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (value, time.time(), size)
+            self.current_bytes += size
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self.current_bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._data))
+                self._pop(oldest)
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def _pop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[2]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """On-disk cache backed by a single SQLite table, with TTL and LRU eviction."""
+
+    def __init__(self, path, ttl=86400, max_entries=10000, max_bytes=None, sliding=False):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Reads already refresh `accessed`; a sliding TTL counts from it instead of `created`
+        self._age_column = "accessed" if sliding else "created"
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL,"
+            " size INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(cache)")]
+        if "size" not in columns:  # Files created before byte accounting existed
+            self._conn.execute("ALTER TABLE cache ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+        self._conn.commit()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    def reopen(self):
+        """Open a fresh connection, e.g. in a worker forked from a process that used this one.
+
+        SQLite connections must not be carried across fork(), so the inherited one
+        is dropped without being touched, closing included.
+        """
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, {self._age_column} FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return default
+            value, stored_at = row
+            if self.ttl is not None and now - stored_at > self.ttl:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return default
+            self._conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(value)
+
+    def set(self, key, value):
+        now = time.time()
+        payload = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created, accessed, size) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, now, now, len(payload)),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def _evict(self, now):
+        # Expired rows first, then the least recently accessed beyond max_entries
+        if self.ttl is not None:
+            self._conn.execute(f"DELETE FROM cache WHERE {self._age_column} < ?", (now - self.ttl,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY accessed ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+        if self.max_bytes is not None:
+            (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()
+            if total > self.max_bytes:
+                stale = []
+                for key, size in self._conn.execute("SELECT key, size FROM cache ORDER BY accessed ASC"):
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((key,))
+                    total -= size
+                self._conn.executemany("DELETE FROM cache WHERE key = ?", stale)
+
+    def __len__(self):
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        return count
+
+
+class TieredCache:
+    """In-memory LRU in front of an optional disk tier, with hit/miss counters."""
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key, default=None):
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            self._count("memory_hits")
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key, _MISSING)
+            if value is not _MISSING:
+                # Promote disk hits so the next lookup stays in-process
+                self.memory.set(key, value)
+                self._count("disk_hits")
+                return value
+        self._count("misses")
+        return default
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+        self._count("sets")
+
+    def delete(self, key):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hits"] = hits
+        stats["hit_ratio"] = hits / lookups if lookups else 0.0
+        stats["memory_entries"] = len(self.memory)
+        if self.memory.max_bytes is not None:
+            stats["memory_bytes"] = self.memory.current_bytes
+        if self.disk is not None:
+            stats["disk_entries"] = len(self.disk)
+        return stats
@@ -0,0 +1,142 @@
+"""Pluggable HTML-to-text extraction for job posting pages.
+
+The fastest available parser is used: selectolax (lexbor), then lxml, then
+BeautifulSoup with the stdlib ``html.parser``. Every backend applies the
+same strategy:
+
+1. the first ``div``/``section`` whose class mentions a job description term,
+2. else ``main``/``article`` or ``div#content``,
+3. else the ``body`` without its header, nav and footer.
+
+Script and style content never reaches the text: the native backends drop
+those nodes in C before any selection, and the html.parser backend removes
+them from the markup so they are never built into the tree.
+
+Parsers are only probed for at import time; each one is imported the first
+time its backend extracts a page.
+"""
+import importlib.util
+import re
+
+# Class substrings that mark a job description container on common job boards
+CONTAINER_CLASS_TERMS = (
+    "job-description", "description", "details", "jobdesc", "job_des", "jobdetail", "job-details",
+)
+CONTAINER_CLASS_RE = re.compile("|".join(re.escape(t) for t in CONTAINER_CLASS_TERMS), re.IGNORECASE)
+
+_SCRIPT_STYLE_RE = re.compile(r"<(script|style)\b[^>]*>.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+# lxml refuses a str that still declares its encoding; the text is already decoded
+_XML_DECLARATION_RE = re.compile(r"\A\ufeff?\s*<\?xml\b[^>]*\?>", re.IGNORECASE)
+
+
+def _installed(package):
+    return importlib.util.find_spec(package) is not None
+
+
+class SelectolaxBackend:
+    name = "selectolax"
+    container_selector = ", ".join(
+        f'{tag}[class*="{term}" i]' for term in CONTAINER_CLASS_TERMS for tag in ("div", "section")
+    )
+
+    def extract(self, html):
+        from selectolax.lexbor import LexborHTMLParser
+
+        tree = LexborHTMLParser(html)
+        tree.strip_tags(["script", "style"])
+
+        node = tree.css_first(self.container_selector)
+        if node is None:
+            node = tree.css_first("main, article") or tree.css_first("div#content")
+        if node is None:
+            node = tree.body
+            if node is None:
+                return ""
+            for element in node.css("header, nav, footer"):
+                element.decompose()
+        return node.text(separator=" ", strip=True)
+
+
+class LxmlBackend:
+    name = "lxml"
+
+    def __init__(self):
+        self._compiled = None
+
+    def _compile(self):
+        # XPath objects are built on the first page, when lxml is imported
+        from lxml import etree
+        import lxml.html
+
+        lowered = "translate(@class, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')"
+        matches = " or ".join(f"contains({lowered}, '{term}')" for term in CONTAINER_CLASS_TERMS)
+        self._compiled = (
+            etree.XPath(f"(//div[@class][{matches}] | //section[@class][{matches}])[1]"),
+            etree.XPath("(//main | //article)[1]"),
+            etree.XPath("(//div[@id='content'])[1]"),
+            lxml.html.HTMLParser(remove_comments=True, remove_pis=True),
+        )
+        return self._compiled
+
+    def extract(self, html):
+        if not html.strip():
+            return ""
+        from lxml import etree
+        import lxml.html
+
+        container, main, content, parser = self._compiled or self._compile()
+        root = lxml.html.document_fromstring(_XML_DECLARATION_RE.sub("", html, count=1), parser=parser)
+        etree.strip_elements(root, "script", "style", with_tail=False)
+
+        found = container(root) or main(root) or content(root)
+        if found:
+            node = found[0]
+        else:
+            node = root.find("body")
+            if node is None:
+                return ""
+            # Keep the tail text when dropping chrome, as BeautifulSoup's extract() does
+            etree.strip_elements(node, "header", "nav", "footer", with_tail=False)
+        return " ".join(text.strip() for text in node.itertext() if text.strip())
+
+
+class HtmlParserBackend:
+    name = "html.parser"
+
+    def extract(self, html):
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(_SCRIPT_STYLE_RE.sub(" ", html), "html.parser")
+
+        node = soup.find(["div", "section"], class_=CONTAINER_CLASS_RE)
+        if node is None:
+            node = soup.find(["main", "article"]) or soup.find("div", {"id": "content"})
+        if node is None:
+            node = soup.find("body")
+            if node is None:
+                return ""
+            for element in node.find_all(["header", "nav", "footer"]):
+                element.extract()
+        return node.get_text(separator=" ", strip=True)
+
+
+BACKENDS = {
+    "selectolax": SelectolaxBackend if _installed("selectolax") else None,
+    "lxml": LxmlBackend if _installed("lxml") else None,
+    "html.parser": HtmlParserBackend,
+}
+
+
+def available_backends():
+    """Names of the backends whose parser is installed, fastest first."""
+    return [name for name, backend in BACKENDS.items() if backend is not None]
+
+
+def get_backend(name=None):
+    """Return a backend instance by name, or the fastest installed one."""
+    if name:
+        backend = BACKENDS.get(name)
+        if backend is None:
+            raise ValueError(f"HTML backend '{name}' is not available; choose from {available_backends()}")
+        return backend()
+    return BACKENDS[available_backends()[0]]()
@@ -0,0 +1,149 @@
+"""Pooled, keep-alive HTTP client used for importing job postings.
+
+A single `requests.Session` is shared across requests so repeated imports
+from the same job board reuse TCP/TLS connections. Responses carrying an
+ETag or Last-Modified header are remembered, and later fetches of the same
+URL are sent as conditional requests so unchanged pages come back as a
+bodiless 304. Remembered bodies are bounded by ``validator_cache_bytes``;
+a page evicted from it is simply fetched in full next time.
+"""
+import threading
+import urllib.parse
+
+from cache import LRUCache
+
+try:  # urllib3 decodes brotli transparently when one of these is installed
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+# Click and campaign trackers (plus utm_*) added by ad networks, mailers and social sites.
+# Generic names such as ref, source or src are kept: some job boards use them to pick the posting.
+TRACKING_PARAMS = frozenset({
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "mc_cid", "mc_eid", "igshid", "yclid",
+    "ref_src", "trk", "trkinfo", "trackingid", "_ga", "_gl",
+})
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/96.0.4664.110 Safari/537.36"
+)
+
+
+def canonicalize_url(url):
+    """Normalise a job URL so tracking variants of the same posting share a cache key."""
+    parsed = urllib.parse.urlsplit(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower()
+    port = parsed.port
+    if port and not (scheme == "http" and port == 80 or scheme == "https" and port == 443):
+        host = f"{host}:{port}"
+    query = sorted(
+        (k, v) for k, v in urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    )
+    path = parsed.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    return urllib.parse.urlunsplit((scheme, host, path, urllib.parse.urlencode(query), ""))
+
+
+class FetchResult:
+    """The parts of a response the extractor needs, including revalidated bodies."""
+
+    def __init__(self, url, status_code, text, headers, not_modified=False):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers
+        self.not_modified = not_modified
+
+
+class HttpClient:
+    """Shared session with pool sizing, per-host concurrency limits and revalidation."""
+
+    def __init__(self, pool_connections=16, pool_maxsize=16, per_host_limit=4,
+                 validator_cache_size=256, validator_cache_bytes=32 * 1024 * 1024,
+                 user_agent=DEFAULT_USER_AGENT):
+        self.per_host_limit = per_host_limit
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.user_agent = user_agent
+        self._session = None
+        # Revalidating needs the body to hand back on a 304, so this is bounded by size too
+        self._validators = LRUCache(max_entries=validator_cache_size, max_bytes=validator_cache_bytes)
+        self._host_slots = {}
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "not_modified": 0}
+
+    @property
+    def session(self):
+        # requests is imported with the first fetch rather than when the app starts
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update({
+                    "User-Agent": self.user_agent,
+                    "Accept-Encoding": ACCEPT_ENCODING,
+                })
+                self._session = session
+            return self._session
+
+    def _slot(self, host):
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return slot
+
+    def get(self, url, timeout=10):
+        """GET a URL, revalidating a remembered copy with If-None-Match/If-Modified-Since."""
+        headers = {}
+        known = self._validators.get(url)
+        if known is not None:
+            if known.get("etag"):
+                headers["If-None-Match"] = known["etag"]
+            if known.get("last_modified"):
+                headers["If-Modified-Since"] = known["last_modified"]
+
+        host = urllib.parse.urlparse(url).netloc.lower()
+        with self._slot(host):
+            response = self.session.get(url, headers=headers, timeout=timeout)
+
+        with self._lock:
+            self._stats["requests"] += 1
+            if response.status_code == 304 and known is not None:
+                self._stats["not_modified"] += 1
+
+        if response.status_code == 304 and known is not None:
+            return FetchResult(url, 200, known["text"], response.headers, not_modified=True)
+
+        if response.status_code == 200:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if etag or last_modified:
+                self._validators.set(url, {
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "text": response.text,
+                })
+        return FetchResult(url, response.status_code, response.text, response.headers)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
@@ -0,0 +1,243 @@
+"""Bounded background job queue for long-running generation work.
+
+Jobs are submitted from request handlers and run on a worker pool, so the
+HTTP worker returns immediately with a job id and the UI polls for status.
+"""
+import inspect
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor
+
+from metrics import Histogram
+
+JOB_WAIT_SECONDS = Histogram("clg_job_wait_seconds", "Time jobs spent queued before a worker picked them up.", ["status"])
+JOB_RUN_SECONDS = Histogram("clg_job_run_seconds", "Time jobs spent running on a worker.", ["status"])
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its depth limit."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a streaming job once cancellation has been requested."""
+
+
+class Job:
+    """A single unit of work tracked by a JobQueue."""
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = QUEUED
+        self.chunks = []
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self.cancel_requested = threading.Event()
+
+    @property
+    def done(self):
+        return self.status in FINISHED_STATES
+
+    @property
+    def text(self):
+        if self.result is not None:
+            return self.result
+        return "".join(self.chunks)
+
+    def timings(self):
+        """Seconds spent waiting in the queue and running on a worker."""
+        now = time.time()
+        queued = (self.started_at or self.finished_at or now) - self.submitted_at
+        running = None
+        if self.started_at is not None:
+            running = (self.finished_at or now) - self.started_at
+        return {"queued_seconds": queued, "run_seconds": running}
+
+    def snapshot(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "text": self.text,
+            "error": self.error,
+            **self.timings(),
+        }
+
+
+class JobQueue:
+    """Runs submitted callables on a bounded thread or process pool.
+
+    Callables that return a generator (thread mode only) are consumed chunk by
+    chunk so pollers can show partial output, and cancellation is checked
+    between chunks. `max_pending` bounds the number of jobs that are queued or
+    running at once.
+    """
+
+    def __init__(self, max_workers=4, max_pending=32, executor="thread", retention=600):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown executor type: {executor}")
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.executor_kind = executor
+        self.retention = retention
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._closing = False
+        if executor == "process":
+            self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+
+    def depth(self):
+        """Number of jobs that are queued or running."""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.done)
+
+    def stats(self):
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0, CANCELLED: 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return {
+            "executor": self.executor_kind,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            **counts,
+        }
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) and return its Job without waiting."""
+        job = Job(uuid.uuid4().hex)
+        with self._lock:
+            if self._closing:
+                raise QueueFullError("The server is restarting. Please try again in a moment.")
+            self._purge(time.time())
+            pending = sum(1 for j in self._jobs.values() if not j.done)
+            if pending >= self.max_pending:
+                raise QueueFullError(
+                    f"Too many generations in progress ({pending}). Please try again shortly."
+                )
+            self._jobs[job.id] = job
+
+        if self.executor_kind == "process":
+            # Work runs in another process, so only the start and end are observable
+            job.future = self._executor.submit(fn, *args, **kwargs)
+            job.future.add_done_callback(lambda f: self._finish(job, f))
+            # The future reports running as soon as it is handed to a worker process
+            threading.Thread(target=self._watch_start, args=(job,), daemon=True).start()
+        else:
+            job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a job; queued jobs never start, streaming jobs stop at the next chunk."""
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        job.cancel_requested.set()
+        if job.future is not None and job.future.cancel():
+            self._mark(job, CANCELLED)
+        return True
+
+    def release(self, job_id):
+        """Forget a finished job once its result has been collected."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.done:
+                del self._jobs[job_id]
+
+    def drain(self, timeout=None, poll=0.1):
+        """Stop accepting jobs and wait for queued and running ones to finish.
+
+        Jobs still unfinished after `timeout` seconds are cancelled. Returns
+        the number of jobs that had to be cancelled.
+        """
+        with self._lock:
+            self._closing = True
+        deadline = None if timeout is None else time.time() + timeout
+        while self.depth() and (deadline is None or time.time() < deadline):
+            time.sleep(poll)
+        with self._lock:
+            unfinished = [job.id for job in self._jobs.values() if not job.done]
+        for job_id in unfinished:
+            self.cancel(job_id)
+        return len(unfinished)
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_pending)
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_requested.is_set():
+            self._mark(job, CANCELLED)
+            return
+        job.started_at = time.time()
+        job.status = RUNNING
+        try:
+            result = fn(*args, **kwargs)
+            if inspect.isgenerator(result):
+                try:
+                    for chunk in result:
+                        if job.cancel_requested.is_set():
+                            raise JobCancelled()
+                        with self._lock:
+                            job.chunks.append(chunk)
+                finally:
+                    result.close()
+                result = None
+            job.result = result
+            self._mark(job, DONE)
+        except JobCancelled:
+            self._mark(job, CANCELLED)
+        except Exception as e:
+            job.error = str(e)
+            self._mark(job, FAILED)
+
+    def _watch_start(self, job):
+        while not job.future.done():
+            if job.future.running():
+                job.started_at = job.started_at or time.time()
+                job.status = RUNNING
+                return
+            time.sleep(0.05)
+
+    def _finish(self, job, future):
+        try:
+            job.result = future.result()
+            self._mark(job, DONE)
+        except CancelledError:
+            self._mark(job, CANCELLED)
+        except Exception as e:
+            job.error = str(e)
+            self._mark(job, FAILED)
+
+    def _mark(self, job, status):
+        with self._lock:
+            if job.done:
+                return
+            job.status = status
+            job.finished_at = time.time()
+        timings = job.timings()
+        JOB_WAIT_SECONDS.observe(timings["queued_seconds"], status=status)
+        if timings["run_seconds"] is not None:
+            JOB_RUN_SECONDS.observe(timings["run_seconds"], status=status)
+
+    def _purge(self, now):
+        # Finished jobs nobody collected are dropped after the retention window
+        for job_id in [k for k, j in self._jobs.items()
+                       if j.done and now - j.finished_at > self.retention]:
+            del self._jobs[job_id]
@@ -0,0 +1,83 @@
+"""Per-key Gemini clients, reused across requests.
+
+``genai.configure(api_key=...)`` swaps the SDK's process-wide default client.
+Two users generating at once could race, and one request could run on the
+other user's key. Instead, each (API key, model) pair gets its own
+``GenerativeModel`` bound to a private service client. Clients live in a
+bounded LRU so repeat requests skip client setup, and the global SDK
+configuration is never touched.
+
+The SDK offers no public way to do this, so build_model uses its private
+client manager. requirements.txt pins the SDK version this was written
+against. If another version lacks those internals, build_model raises
+rather than fall back to the shared process-wide key.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+# The google-generativeai release whose private client internals build_model relies on
+PINNED_SDK_VERSION = "0.3.1"
+
+
+def _key_fingerprint(api_key):
+    # Pool keys hold a digest so raw API keys don't sit in dict keys or stats
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def build_model(api_key, model_name):
+    """Create a GenerativeModel whose requests always carry api_key."""
+    # The SDK pulls in grpc and protobuf (~250 ms), so it loads with the first client, not at startup
+    import google.generativeai as genai
+    from google.generativeai import client as genai_client
+
+    model = genai.GenerativeModel(model_name)
+    if not (hasattr(genai_client, "_ClientManager") and hasattr(model, "_client")):
+        # genai.configure() would put every user on whichever key was configured last
+        raise RuntimeError(
+            f"google-generativeai {getattr(genai, '__version__', '(unknown version)')} has no per-key "
+            f"client API; install google-generativeai=={PINNED_SDK_VERSION} as pinned in requirements.txt"
+        )
+    # google-generativeai has no public per-model key; requirements.txt pins the
+    # version whose private client manager and model._client this relies on
+    manager = genai_client._ClientManager()
+    manager.configure(api_key=api_key)
+    model._client = manager.make_client("generative")
+    return model
+
+
+class GeminiClientPool:
+    """Thread-safe LRU of configured models keyed by (API key hash, model name)."""
+
+    def __init__(self, max_clients=32, factory=build_model):
+        self.max_clients = max_clients
+        self.factory = factory
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get_model(self, api_key, model_name):
+        key = (_key_fingerprint(api_key), model_name)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                self._stats["hits"] += 1
+                return model
+            self._stats["misses"] += 1
+
+        # Build outside the lock; if two threads race, the first one stored wins
+        model = self.factory(api_key, model_name)
+        with self._lock:
+            existing = self._models.get(key)
+            if existing is not None:
+                return existing
+            self._models[key] = model
+            while len(self._models) > self.max_clients:
+                self._models.popitem(last=False)
+                self._stats["evictions"] += 1
+        return model
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "clients": len(self._models), "max_clients": self.max_clients}
@@ -0,0 +1,427 @@
+"""Route generation requests across models, with fallback and hedging.
+
+A route is an ordered chain of model specs (``"<backend>:<model>"``) chosen
+by the requested letter length. The first model is tried first. When it
+times out, is throttled or is unavailable, the next one takes over. With
+``hedge_after`` set, a request that has no answer within that budget also
+goes to the next model, and whichever answers first wins.
+
+Attempts that time out or lose a hedge are abandoned: queued ones never
+start and running ones stop retrying. A call already in flight can't be
+interrupted (the SDK has no request timeout), so it keeps its worker until
+it returns; ``stats()["abandoned_running"]`` counts those, and the worker
+pool, which runs both generate() calls and stream() pumps, should leave
+room for them. Once a stream has started, a model that
+goes quiet for ``idle_timeout`` seconds fails the stream.
+
+Backends implement ``generate(api_key, model, prompt)`` returning text and
+``stream(api_key, model, prompt)`` yielding chunks. `GeminiBackend` talks to
+Google AI Studio. `StubBackend` is a local fake with tunable latency for
+offline runs, tests and load tests.
+"""
+import json
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from metrics import Counter, Histogram
+from prompt_budget import estimate_tokens
+from rate_limit import AUTH, INVALID_REQUEST, TIMEOUT, LLMError, classify
+
+LLM_SECONDS = Histogram("clg_llm_request_seconds", "Model call latency per attempt, including guard retries.",
+                        ["model", "outcome"])
+LLM_TTFT_SECONDS = Histogram("clg_llm_time_to_first_token_seconds", "Time from a streaming call to its first chunk.",
+                             ["model"])
+LLM_TOKENS = Counter("clg_llm_tokens_total", "Estimated prompt (in) and completion (out) tokens.",
+                     ["model", "direction"])
+ROUTED_REQUESTS = Counter("clg_llm_routed_requests_total", "Routed generation requests by route and final outcome.",
+                          ["route", "outcome"])
+
+# Errors that another model won't fix
+NO_FALLBACK = (AUTH, INVALID_REQUEST)
+
+
+def load_routes(config, defaults):
+    """Parse a JSON route table ({"default": [...], "<length>": [...]}), or use the defaults.
+
+    A configured table replaces the defaults as a whole; routes it leaves
+    out use its "default" chain.
+    """
+    routes = json.loads(config) if config else {name: list(chain) for name, chain in defaults.items()}
+    if not routes.get("default"):
+        raise ValueError("Model routes need a non-empty 'default' chain")
+    return routes
+
+
+class GeminiBackend:
+    """Google Gemini via per-key clients from llm_clients.GeminiClientPool."""
+
+    guarded = True
+
+    def __init__(self, clients):
+        self.clients = clients
+
+    def generate(self, api_key, model, prompt):
+        return self.clients.get_model(api_key, model).generate_content(prompt).text
+
+    def stream(self, api_key, model, prompt):
+        response = self.clients.get_model(api_key, model).generate_content(prompt, stream=True)
+        for chunk in response:
+            # Chunks without text parts (e.g. the final safety/finish chunk) raise on .text
+            try:
+                text = chunk.text
+            except ValueError:
+                continue
+            if text:
+                yield text
+
+
+class StubBackend:
+    """Offline stand-in that writes a canned letter after a configurable delay."""
+
+    guarded = False
+
+    def __init__(self, latency=0.0, chunk_delay=0.0, chunk_words=8, text=None):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.chunk_words = chunk_words
+        self.text = text
+
+    def _letter(self, model, prompt):
+        if self.text is not None:
+            return self.text
+        return (
+            "Dear Hiring Manager,\n\n"
+            f"This is an offline draft from the '{model}' stub model, written for a prompt of "
+            f"{len(prompt)} characters. It stands in for a tailored cover letter so the app can be "
+            "exercised without network access or an API key.\n\n"
+            "I would welcome the chance to discuss how my experience fits this role.\n\n"
+            "Sincerely,\nThe Candidate"
+        )
+
+    def generate(self, api_key, model, prompt):
+        time.sleep(self.latency)
+        return self._letter(model, prompt)
+
+    def stream(self, api_key, model, prompt):
+        time.sleep(self.latency)
+        words = self._letter(model, prompt).split(" ")
+        for i in range(0, len(words), self.chunk_words):
+            if i:
+                time.sleep(self.chunk_delay)
+            yield " ".join(words[i:i + self.chunk_words]) + (" " if i + self.chunk_words < len(words) else "")
+
+
+class ModelRouter:
+    """Chooses a model chain per request and runs it with fallback and optional hedging."""
+
+    def __init__(self, backends, routes, guard=None, timeout=120.0, hedge_after=None, max_workers=16,
+                 idle_timeout=60.0):
+        self.backends = backends
+        self.routes = routes
+        self.guard = guard
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.idle_timeout = idle_timeout
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="router")
+        self._lock = threading.Lock()
+        self._abandoned_running = 0
+        self._stats = {"requests": 0, "fallbacks": 0, "hedges": 0, "hedge_wins": 0, "timeouts": 0,
+                       "abandoned": 0}
+        for chain in self.routes.values():
+            for spec in chain:
+                self._split(spec)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _split(self, spec):
+        backend_name, _, model = spec.partition(":")
+        if backend_name not in self.backends or not model:
+            raise ValueError(f"Unknown model spec '{spec}'; expected <backend>:<model> with backend in {sorted(self.backends)}")
+        return self.backends[backend_name], model
+
+    def route_name(self, length=None):
+        return length if length in self.routes else "default"
+
+    def chain_for(self, length=None):
+        """Ordered model specs for a request of the given length setting."""
+        return self.routes.get(length) or self.routes["default"]
+
+    def primary_model(self, length=None):
+        return self.chain_for(length)[0]
+
+    def _guarded(self, backend, api_key, model, fn, retries, cancel):
+        if self.guard is None or not backend.guarded:
+            try:
+                return fn()
+            except Exception as e:
+                raise classify(e) from e
+        return self.guard.call(api_key, model, fn, retries=retries, cancel=cancel)
+
+    def _abandon(self, future, cancel):
+        """Stop caring about an attempt: a queued one never starts, a running one stops retrying."""
+        cancel.set()
+        self._count("abandoned")
+        if future.cancel():
+            return
+        with self._lock:
+            self._abandoned_running += 1
+        future.add_done_callback(self._abandoned_done)
+
+    def _abandoned_done(self, future):
+        with self._lock:
+            self._abandoned_running -= 1
+
+    def generate(self, api_key, prompt, length=None):
+        """Return (text, model_spec) from the first model in the chain that answers."""
+        self._count("requests")
+        chain = list(self.chain_for(length))
+        pending = {}  # future -> (spec, deadline, cancel event)
+        last_error = None
+        hedged = False
+        first = True
+
+        try:
+            while chain or pending:
+                if not pending:
+                    if not first:
+                        self._count("fallbacks")
+                    first = False
+                    spec = chain.pop(0)
+                    future, cancel = self._launch(spec, api_key, prompt, last=not chain)
+                    pending[future] = (spec, time.monotonic() + self.timeout, cancel)
+
+                now = time.monotonic()
+                wait_for = min(deadline for _, deadline, _ in pending.values()) - now
+                can_hedge = self.hedge_after is not None and chain and not hedged and len(pending) == 1
+                if can_hedge:
+                    started = min(deadline for _, deadline, _ in pending.values()) - self.timeout
+                    wait_for = min(wait_for, started + self.hedge_after - now)
+
+                done, _ = wait(list(pending), timeout=max(wait_for, 0), return_when=FIRST_COMPLETED)
+
+                if not done:
+                    now = time.monotonic()
+                    expired = [f for f, (_, deadline, _) in pending.items() if deadline <= now]
+                    for future in expired:
+                        spec, _, cancel = pending.pop(future)
+                        self._abandon(future, cancel)
+                        self._count("timeouts")
+                        last_error = LLMError(TIMEOUT, f"{spec} did not answer within {self.timeout:.0f}s.")
+                    if not expired and can_hedge:
+                        # The primary is slow: race the next model against it
+                        hedged = True
+                        self._count("hedges")
+                        spec = chain.pop(0)
+                        future, cancel = self._launch(spec, api_key, prompt, last=not chain)
+                        pending[future] = (spec, time.monotonic() + self.timeout, cancel)
+                    continue
+
+                for future in done:
+                    spec, _, _ = pending.pop(future)
+                    try:
+                        text = future.result()
+                    except LLMError as e:
+                        last_error = e
+                        if e.kind in NO_FALLBACK:
+                            ROUTED_REQUESTS.inc(route=self.route_name(length), outcome=e.kind)
+                            raise
+                        continue
+                    if hedged and spec != self.primary_model(length):
+                        self._count("hedge_wins")
+                    ROUTED_REQUESTS.inc(route=self.route_name(length), outcome="ok")
+                    return text, spec
+        finally:
+            # A losing hedge, or anything left when the request gives up
+            for future, (_, _, cancel) in pending.items():
+                self._abandon(future, cancel)
+
+        error = last_error or LLMError(TIMEOUT, "No model produced a response.")
+        ROUTED_REQUESTS.inc(route=self.route_name(length), outcome=error.kind)
+        raise error
+
+    def _launch(self, spec, api_key, prompt, last):
+        backend, model = self._split(spec)
+        # Only the last model in the chain spends time on retries; earlier ones fall back instead
+        retries = None if last else 0
+
+        cancel = threading.Event()
+
+        def attempt():
+            started = time.perf_counter()
+            try:
+                text = self._guarded(backend, api_key, model, lambda: backend.generate(api_key, model, prompt),
+                                     retries, cancel)
+            except Exception as e:
+                LLM_SECONDS.observe(time.perf_counter() - started, model=spec, outcome=classify(e).kind)
+                raise
+            LLM_SECONDS.observe(time.perf_counter() - started, model=spec, outcome="ok")
+            LLM_TOKENS.inc(estimate_tokens(prompt), model=spec, direction="in")
+            LLM_TOKENS.inc(estimate_tokens(text), model=spec, direction="out")
+            return text
+
+        return self._executor.submit(attempt), cancel
+
+    def stream(self, api_key, prompt, length=None):
+        """Yield chunks from the first model in the chain to start answering.
+
+        Fallback and hedging apply until the first chunk arrives; after that
+        the winning stream is followed to the end, unless it sends nothing
+        for idle_timeout seconds.
+        """
+        self._count("requests")
+        chain = list(self.chain_for(length))
+        events = queue.Queue()
+        attempts = {}  # attempt id -> {"spec", "cancel", "future", "deadline", "started"}
+        winner = None
+        last_error = None
+        hedged = False
+        first = True
+        outcome = "cancelled"  # Unless the stream ends or fails first
+
+        def pump(attempt_id, spec, cancel, last):
+            backend, model = self._split(spec)
+            retries = None if last else 0
+            started = time.perf_counter()
+            received = []
+            outcome = "ok"
+            try:
+                if self.guard is not None and backend.guarded:
+                    chunks = self.guard.stream(api_key, model, lambda: backend.stream(api_key, model, prompt),
+                                               retries=retries, cancel=cancel)
+                else:
+                    chunks = backend.stream(api_key, model, prompt)
+                try:
+                    for chunk in chunks:
+                        if not received:
+                            LLM_TTFT_SECONDS.observe(time.perf_counter() - started, model=spec)
+                        received.append(chunk)
+                        if cancel.is_set():
+                            outcome = "cancelled"
+                            return
+                        events.put((attempt_id, "chunk", chunk))
+                finally:
+                    close = getattr(chunks, "close", None)
+                    if close is not None:
+                        close()
+                events.put((attempt_id, "end", None))
+            except Exception as e:
+                error = classify(e)
+                outcome = error.kind
+                events.put((attempt_id, "error", error))
+            finally:
+                LLM_SECONDS.observe(time.perf_counter() - started, model=spec, outcome=outcome)
+                if received:
+                    LLM_TOKENS.inc(estimate_tokens(prompt), model=spec, direction="in")
+                    LLM_TOKENS.inc(estimate_tokens("".join(received)), model=spec, direction="out")
+
+        def launch():
+            spec = chain.pop(0)
+            attempt_id = len(attempts)
+            cancel = threading.Event()
+            # Pumps share the bounded pool with generate(), so streams can't outgrow max_workers
+            future = self._executor.submit(pump, attempt_id, spec, cancel, not chain)
+            attempts[attempt_id] = {"spec": spec, "cancel": cancel, "future": future,
+                                    "deadline": time.monotonic() + self.timeout, "started": time.monotonic()}
+
+        def abandon(attempt):
+            # Attempts that reported their end or error are finishing anyway
+            if not attempt.get("reported") and not attempt.get("abandoned"):
+                attempt["abandoned"] = True
+                self._abandon(attempt["future"], attempt["cancel"])
+
+        try:
+            while True:
+                live = [a for a in attempts.values() if not a.get("finished")]
+                if winner is None and not live:
+                    if not chain:
+                        raise last_error or LLMError(TIMEOUT, "No model produced a response.")
+                    if not first:
+                        self._count("fallbacks")
+                    first = False
+                    launch()
+                    continue
+
+                timeout = self.idle_timeout
+                can_hedge = False
+                if winner is None:
+                    now = time.monotonic()
+                    timeout = min(a["deadline"] for a in live) - now
+                    can_hedge = self.hedge_after is not None and chain and not hedged and len(live) == 1
+                    if can_hedge:
+                        timeout = min(timeout, live[0]["started"] + self.hedge_after - now)
+
+                try:
+                    attempt_id, kind, payload = events.get(timeout=max(timeout, 0) if timeout is not None else None)
+                except queue.Empty:
+                    if winner is not None:
+                        # The chosen model went quiet mid-answer; it is abandoned below and its pump
+                        # exits at its next chunk
+                        self._count("timeouts")
+                        raise LLMError(TIMEOUT, f"{attempts[winner]['spec']} stopped sending output for "
+                                                f"{self.idle_timeout:.0f}s.")
+                    now = time.monotonic()
+                    expired = [a for a in live if a["deadline"] <= now]
+                    for attempt in expired:
+                        attempt["finished"] = True
+                        abandon(attempt)
+                        self._count("timeouts")
+                        last_error = LLMError(TIMEOUT, f"{attempt['spec']} did not start answering within {self.timeout:.0f}s.")
+                    if not expired and can_hedge:
+                        hedged = True
+                        self._count("hedges")
+                        launch()
+                    continue
+
+                attempt = attempts[attempt_id]
+                if winner is not None and attempt_id != winner:
+                    continue  # Late output from a losing hedge
+                if attempt.get("finished"):
+                    continue
+
+                if kind == "chunk":
+                    if winner is None:
+                        winner = attempt_id
+                        if hedged and attempt_id != 0:
+                            self._count("hedge_wins")
+                        for other_id, other in attempts.items():
+                            if other_id != attempt_id:
+                                abandon(other)
+                    yield payload
+                elif kind == "end":
+                    attempt["finished"] = attempt["reported"] = True
+                    if winner is None:
+                        winner = attempt_id  # Empty but successful answer
+                    outcome = "ok"
+                    return
+                else:
+                    attempt["finished"] = attempt["reported"] = True
+                    if winner is not None:
+                        raise payload
+                    last_error = payload
+                    if payload.kind in NO_FALLBACK:
+                        raise payload
+        except LLMError as e:
+            outcome = e.kind
+            raise
+        finally:
+            ROUTED_REQUESTS.inc(route=self.route_name(length), outcome=outcome)
+            # Losing hedges, a stream that went quiet, or a caller that stopped reading
+            for attempt in attempts.values():
+                abandon(attempt)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["routes"] = self.routes
+        stats["hedge_after"] = self.hedge_after
+        stats["timeout"] = self.timeout
+        stats["idle_timeout"] = self.idle_timeout
+        stats["max_workers"] = self.max_workers
+        with self._lock:
+            stats["abandoned_running"] = self._abandoned_running
+        return stats
@@ -0,0 +1,178 @@
+"""In-memory PDF text extraction shared by the upload callbacks.
+
+Uploads arrive as base64 data URLs. They are decoded once, parsed straight
+from an ``io.BytesIO`` with no temporary file, and the per-page text is
+memoised on a hash of the upload. Several callbacks can fire on the same
+``pdf-upload`` contents; the second one reuses the first one's result, and
+waits for it if the first is still parsing.
+
+Large documents are split into page ranges that are extracted on a process
+pool, since PyPDF2 text extraction is pure Python and CPU-bound. Uploads are
+capped by size and page count, and callers that only need the beginning of a
+document can stop after the first N pages.
+"""
+import base64
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from cache import LRUCache
+
+PARALLEL_PAGE_THRESHOLD = int(os.environ.get("CLG_PDF_PARALLEL_THRESHOLD", "16"))
+PDF_WORKERS = int(os.environ.get("CLG_PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+# The upload limits; app2 applies the same values to /upload and the upload component
+MAX_PDF_PAGES = int(os.environ.get("CLG_UPLOAD_MAX_PAGES", "100"))
+MAX_PDF_BYTES = int(os.environ.get("CLG_UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+
+# Parsed uploads kept for reuse, bounded by extracted text size
+_page_cache = LRUCache(max_entries=64, max_bytes=16 * 1024 * 1024)
+_inflight = {}
+_inflight_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class PdfTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured PDF size limit."""
+
+
+def content_key(contents):
+    """Hash of a dcc.Upload contents string, used as the memo key."""
+    return hashlib.sha256(contents.encode("ascii", "ignore")).hexdigest()
+
+
+def decode_data_url(contents):
+    """Decode the base64 payload of a ``data:<type>;base64,<data>`` string."""
+    _, _, data = contents.partition(",")
+    return base64.b64decode(data)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Forking a threaded web server process is unsafe, so workers come from a clean
+            # forkserver (spawn where unavailable). Both import the parent's __main__ module in
+            # each worker, so a script that extracts PDFs must keep its own work under
+            # `if __name__ == "__main__":`.
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def open_pdf(data):
+    """A PdfReader over bytes or a seekable binary file; PyPDF2 is imported on the first PDF rather than at startup."""
+    import PyPDF2
+
+    return PyPDF2.PdfReader(data if hasattr(data, "read") else io.BytesIO(data))
+
+
+def _extract_range(data, start, stop):
+    reader = open_pdf(data)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def read_pdf_pages(data, max_pages=None, parallel_threshold=None, workers=None):
+    """Extract the text of the first max_pages pages of an in-memory PDF, in order.
+
+    Documents with at least parallel_threshold pages are split into contiguous
+    page ranges that are extracted concurrently on the process pool.
+    """
+    parallel_threshold = PARALLEL_PAGE_THRESHOLD if parallel_threshold is None else parallel_threshold
+    workers = PDF_WORKERS if workers is None else workers
+    reader = open_pdf(data)
+    count = len(reader.pages)
+    if max_pages is not None:
+        count = min(count, max_pages)
+
+    if workers <= 1 or count < max(parallel_threshold, 2):
+        return [reader.pages[i].extract_text() or "" for i in range(count)]
+
+    step = -(-count // workers)  # ceil
+    ranges = [(start, min(start + step, count)) for start in range(0, count, step)]
+    pool = _get_pool()
+    try:
+        futures = [pool.submit(_extract_range, data, start, stop) for start, stop in ranges]
+        pages = []
+        for future in futures:
+            pages.extend(future.result())
+        return pages
+    except BrokenProcessPool:
+        # A worker died (crash, OOM kill); drop the pool so the next large PDF starts a
+        # fresh one, and finish this one in-process
+        _reset_pool(pool)
+        return [reader.pages[i].extract_text() or "" for i in range(count)]
+
+
+def _reset_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def count_pdf_pages(data):
+    """Page count of a PDF (bytes or a seekable file), read from the page tree without extracting text."""
+    return len(open_pdf(data).pages)
+
+
+def _memoized_pages(key, load, max_pages):
+    limit = MAX_PDF_PAGES if max_pages is None else min(max_pages, MAX_PDF_PAGES)
+    key = f"{key}:{limit}"
+    pages = _page_cache.get(key)
+    if pages is not None:
+        return pages
+
+    with _inflight_lock:
+        pending = _inflight.get(key)
+        owner = pending is None
+        if owner:
+            pending = _inflight[key] = {"done": threading.Event(), "pages": None, "error": None}
+
+    if not owner:
+        pending["done"].wait()
+        if pending["error"] is not None:
+            raise pending["error"]
+        return pending["pages"]
+
+    try:
+        pages = tuple(read_pdf_pages(load(), max_pages=limit))
+        _page_cache.set(key, pages)
+        pending["pages"] = pages
+        return pages
+    except Exception as e:
+        pending["error"] = e
+        raise
+    finally:
+        pending["done"].set()
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def extract_pdf_pages(contents, max_pages=None):
+    """Return the page texts for an uploaded PDF, parsing each distinct upload once.
+
+    At most min(max_pages, MAX_PDF_PAGES) pages are read; uploads larger than
+    MAX_PDF_BYTES raise PdfTooLargeError before anything is decoded.
+    """
+    # base64 inflates by 4/3, so the payload length bounds the decoded size
+    approx_bytes = (len(contents) - contents.find(",") - 1) * 3 // 4
+    if approx_bytes > MAX_PDF_BYTES:
+        raise PdfTooLargeError(
+            f"PDF is too large ({approx_bytes / 1048576:.1f} MB); the limit is {MAX_PDF_BYTES / 1048576:.0f} MB."
+        )
+    return _memoized_pages(content_key(contents), lambda: decode_data_url(contents), max_pages)
+
+
+def extract_upload_pages(upload, max_pages=None):
+    """Like extract_pdf_pages, for a stored uploads.Upload (memoised on its SHA-256)."""
+    if upload.size > MAX_PDF_BYTES:
+        raise PdfTooLargeError(
+            f"PDF is too large ({upload.size / 1048576:.1f} MB); the limit is {MAX_PDF_BYTES / 1048576:.0f} MB."
+        )
+    return _memoized_pages(upload.sha256, upload.read, max_pages)
@@ -0,0 +1,131 @@
+"""Shrink job descriptions to a token budget before they go into a prompt.
+
+Text scraped from a posting page often carries navigation, cookie banners
+and "similar jobs" lists. When a description is over budget,
+`PromptBudget.compact` first removes those and repeated sentences and, if
+the text is still over budget, keeps the segments densest in requirements,
+in their original order. Descriptions within budget are left as they are,
+since a pasted posting can mention cookies or a newsletter for real.
+
+Token counts are estimated at four characters per token, which is close
+for English text and needs no tokenizer or network call.
+"""
+import math
+import re
+import threading
+
+CHARS_PER_TOKEN = 4
+
+# Segments that are page chrome rather than part of the posting
+BOILERPLATE_RE = re.compile(
+    r"\b(cookies?|privacy (policy|statement|notice)|terms of (use|service)|sign (in|up)|log ?in|"
+    r"create (an )?account|apply now|easy apply|save (this )?job|share (this )?(job|posting)|"
+    r"report (this )?job|all rights reserved|skip to (main )?content|back to (search|results)|"
+    r"subscribe|newsletter|follow us|job alert)\b|©",
+    re.IGNORECASE,
+)
+
+# Everything after one of these is another listing, not this posting
+TRAILER_RE = re.compile(
+    r"\b(similar jobs|jobs you may (like|be interested in)|people also (viewed|applied)|"
+    r"more jobs (from|like this)|recommended jobs|other jobs at)\b",
+    re.IGNORECASE,
+)
+
+# Words that mark what the role asks for and does
+REQUIREMENT_RE = re.compile(
+    r"\b(requirements?|qualifications?|responsibilit(y|ies)|experience|skills?|must|required|"
+    r"preferred|proficien(t|cy)|knowledge|degree|years?|ability|familiar(ity)?|you will|you'll|"
+    r"we're looking for|looking for|nice to have|bonus|expertise|background|duties|role)\b",
+    re.IGNORECASE,
+)
+
+_SEGMENT_RE = re.compile(r"\n+|(?<=[.!?])\s+(?=[A-Z0-9\"'(])|\s*[•▪●◦]\s*")
+_NORMALIZE_RE = re.compile(r"[^a-z0-9]+")
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def split_segments(text):
+    """Split text into lines, sentences and bullet items."""
+    return [segment.strip() for segment in _SEGMENT_RE.split(text or "") if segment and segment.strip()]
+
+
+def _score(segment, position):
+    hits = len(REQUIREMENT_RE.findall(segment))
+    # The opening lines usually name the role and company, which the letter needs
+    lead_bonus = 2.0 if position < 3 else 0.0
+    return hits / math.sqrt(estimate_tokens(segment)) + lead_bonus
+
+
+class PromptBudget:
+    """Compacts job descriptions to ``max_tokens`` and keeps before/after counters."""
+
+    def __init__(self, max_tokens=1500, min_trailer_position=0.3):
+        self.max_tokens = max_tokens
+        self.min_trailer_position = min_trailer_position
+        self._lock = threading.Lock()
+        self._stats = {"compactions": 0, "compacted": 0, "tokens_before": 0, "tokens_after": 0}
+
+    def compact(self, text):
+        """Return (compacted_text, report) where report has the token counts before and after."""
+        text = text or ""
+        tokens_before = estimate_tokens(text)
+        segments = split_segments(text) if tokens_before > self.max_tokens else []
+        kept = []
+        seen = set()
+        removed = {"boilerplate": 0, "duplicates": 0, "trailer": 0, "over_budget": 0}
+
+        # Only runs (over budget) as the first step towards the budget
+        for index, segment in enumerate(segments):
+            if index >= len(segments) * self.min_trailer_position and TRAILER_RE.search(segment):
+                removed["trailer"] = len(segments) - index
+                break
+            if BOILERPLATE_RE.search(segment) and len(REQUIREMENT_RE.findall(segment)) < 2:
+                removed["boilerplate"] += 1
+                continue
+            key = _NORMALIZE_RE.sub(" ", segment.lower()).strip()
+            if key in seen:
+                removed["duplicates"] += 1
+                continue
+            seen.add(key)
+            kept.append(segment)
+
+        if sum(estimate_tokens(s) + 1 for s in kept) > self.max_tokens:
+            ranked = sorted(range(len(kept)), key=lambda i: _score(kept[i], i), reverse=True)
+            chosen = set()
+            used = 0
+            for i in ranked:
+                cost = estimate_tokens(kept[i]) + 1
+                if used + cost <= self.max_tokens:
+                    chosen.add(i)
+                    used += cost
+            removed["over_budget"] = len(kept) - len(chosen)
+            kept = [segment for i, segment in enumerate(kept) if i in chosen]
+
+        # Leave text that needed no changes byte-for-byte as it was
+        compacted = text if not any(removed.values()) else "\n".join(kept)
+        report = {
+            "tokens_before": tokens_before,
+            "tokens_after": estimate_tokens(compacted),
+            "max_tokens": self.max_tokens,
+            "removed": removed,
+        }
+
+        with self._lock:
+            self._stats["compactions"] += 1
+            self._stats["compacted"] += compacted is not text
+            self._stats["tokens_before"] += report["tokens_before"]
+            self._stats["tokens_after"] += report["tokens_after"]
+        return compacted, report
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["max_tokens"] = self.max_tokens
+        stats["saved_ratio"] = (
+            1 - stats["tokens_after"] / stats["tokens_before"] if stats["tokens_before"] else 0.0
+        )
+        return stats
@@ -0,0 +1,377 @@
+"""Rate limiting, retries and circuit breaking around LLM calls.
+
+`LLMGuard` wraps each model call with:
+
+* an adaptive token bucket per API key (AIMD: the rate halves on a 429 and
+  creeps back up on success),
+* a concurrency cap per model,
+* retries with full-jitter exponential backoff on 429 and 5xx responses,
+* a circuit breaker per model that fails fast while the backend is down.
+
+Failures surface as `LLMError` with a machine-readable ``kind``, and
+`GenerationResult` carries either the text or the error, so error messages
+never end up in a letter.
+"""
+import hashlib
+import random
+import threading
+import time
+from collections import OrderedDict
+
+RATE_LIMITED = "rate_limited"
+UNAVAILABLE = "unavailable"
+CIRCUIT_OPEN = "circuit_open"
+INVALID_REQUEST = "invalid_request"
+AUTH = "auth"
+TIMEOUT = "timeout"
+UNKNOWN = "error"
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """A classified LLM failure."""
+
+    def __init__(self, kind, message, retry_after=None, attempts=1):
+        super().__init__(message)
+        self.kind = kind
+        self.message = message
+        self.retry_after = retry_after
+        self.attempts = attempts
+
+
+class GenerationResult:
+    """Outcome of a generation: either ``text`` or an ``error`` with its ``error_kind``."""
+
+    def __init__(self, text=None, error=None, error_kind=None, retry_after=None, attempts=1, cached=False,
+                 model=None, compaction=None):
+        self.text = text
+        self.error = error
+        self.error_kind = error_kind
+        self.retry_after = retry_after
+        self.attempts = attempts
+        self.cached = cached
+        self.model = model
+        self.compaction = compaction
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @classmethod
+    def failure(cls, exc):
+        if isinstance(exc, LLMError):
+            return cls(error=exc.message, error_kind=exc.kind, retry_after=exc.retry_after, attempts=exc.attempts)
+        return cls(error=str(exc), error_kind=UNKNOWN)
+
+    def to_dict(self):
+        return {
+            "text": self.text,
+            "error": self.error,
+            "error_kind": self.error_kind,
+            "retry_after": self.retry_after,
+            "attempts": self.attempts,
+            "cached": self.cached,
+            "model": self.model,
+            "compaction": self.compaction,
+        }
+
+
+def status_code(exc):
+    """HTTP-style status of an SDK exception, if it carries one."""
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return code
+    # google.api_core exceptions expose grpc status via .grpc_status_code
+    grpc_code = getattr(exc, "grpc_status_code", None)
+    name = getattr(grpc_code, "name", "")
+    return {
+        "RESOURCE_EXHAUSTED": 429,
+        "UNAVAILABLE": 503,
+        "INTERNAL": 500,
+        "DEADLINE_EXCEEDED": 504,
+        "UNAUTHENTICATED": 401,
+        "PERMISSION_DENIED": 403,
+        "INVALID_ARGUMENT": 400,
+    }.get(name)
+
+
+def classify(exc):
+    """Map an exception from a model call onto an LLMError."""
+    if isinstance(exc, LLMError):
+        return exc
+    code = status_code(exc)
+    message = str(exc)
+    if code is None and ("429" in message or "quota" in message.lower()):
+        code = 429
+    if code == 429:
+        return LLMError(RATE_LIMITED, "The model is rate limiting requests. Please try again shortly.")
+    if code in (401, 403):
+        return LLMError(AUTH, "The API key was rejected. Please check it and save it again.")
+    if code == 400:
+        return LLMError(INVALID_REQUEST, message)
+    if code == 504 or isinstance(exc, TimeoutError):
+        return LLMError(TIMEOUT, "The model took too long to respond.")
+    if code in RETRYABLE_STATUS:
+        return LLMError(UNAVAILABLE, "The model is temporarily unavailable.")
+    return LLMError(UNKNOWN, message)
+
+
+def is_retryable(error):
+    return error.kind in (RATE_LIMITED, UNAVAILABLE, TIMEOUT)
+
+
+class TokenBucket:
+    """Token bucket whose refill rate adapts to throttling (AIMD)."""
+
+    def __init__(self, rate_per_minute, burst, min_rate_per_minute=1):
+        self.max_rate = rate_per_minute / 60.0
+        self.min_rate = min(min_rate_per_minute, rate_per_minute) / 60.0
+        self.rate = self.max_rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, max_wait):
+        """Take a token, waiting up to max_wait seconds; returns False if that isn't enough."""
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def wait_time(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (1 - self.tokens) / self.rate)
+
+    def penalize(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def reward(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; lets one trial call through after a cooldown."""
+
+    def __init__(self, failure_threshold=5, cooldown=30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        """Return (allowed, retry_after)."""
+        with self._lock:
+            if self.opened_at is None:
+                return True, None
+            remaining = self.cooldown - (time.monotonic() - self.opened_at)
+            if remaining > 0 or self._trial_in_flight:
+                return False, max(remaining, 1.0)
+            self._trial_in_flight = True
+            return True, None
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_cancel(self):
+        # A trial call abandoned by its caller proves nothing either way
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class LLMGuard:
+    """Applies per-key rate limits, per-model concurrency caps, retries and circuit breaking."""
+
+    def __init__(self, rate_per_minute=30, burst=5, max_concurrency=8, max_retries=4,
+                 backoff_base=1.0, backoff_cap=30.0, max_queue_wait=30.0,
+                 failure_threshold=5, cooldown=30.0, max_keys=1024):
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_queue_wait = max_queue_wait
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._slots = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "retries": 0, "rate_limited": 0, "circuit_rejections": 0, "failures": 0}
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _bucket(self, api_key):
+        key = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate_per_minute, self.burst)
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket
+
+    def _model_state(self, model_name):
+        with self._lock:
+            if model_name not in self._slots:
+                self._slots[model_name] = threading.BoundedSemaphore(self.max_concurrency)
+                self._breakers[model_name] = CircuitBreaker(self.failure_threshold, self.cooldown)
+            return self._slots[model_name], self._breakers[model_name]
+
+    def breaker(self, model_name):
+        return self._model_state(model_name)[1]
+
+    def _backoff(self, attempt):
+        # Full jitter: uniform in [0, min(cap, base * 2**attempt)]
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def _admit(self, api_key, model_name):
+        slots, breaker = self._model_state(model_name)
+        allowed, retry_after = breaker.allow()
+        if not allowed:
+            self._count("circuit_rejections")
+            raise LLMError(CIRCUIT_OPEN, "The model is failing repeatedly; requests are paused briefly.",
+                           retry_after=retry_after)
+        bucket = self._bucket(api_key)
+        if not bucket.acquire(self.max_queue_wait):
+            breaker.record_cancel()
+            self._count("rate_limited")
+            raise LLMError(RATE_LIMITED, "Too many requests for this API key. Please try again shortly.",
+                           retry_after=bucket.wait_time())
+        if not slots.acquire(timeout=self.max_queue_wait):
+            breaker.record_cancel()
+            raise LLMError(RATE_LIMITED, "The model is at capacity. Please try again shortly.",
+                           retry_after=self.max_queue_wait)
+        return slots, breaker, bucket
+
+    def _failed(self, error, breaker, bucket):
+        if error.kind in (UNAVAILABLE, TIMEOUT):
+            # Only server-side trouble counts towards opening the circuit
+            breaker.record_failure()
+        else:
+            # A 429, a rejected key or a blocked prompt is about this caller, not the model; the
+            # breaker is per model and shared by every user, so it only releases a trial call
+            breaker.record_cancel()
+            if error.kind == RATE_LIMITED:
+                bucket.penalize()
+        self._count("failures")
+
+    def call(self, api_key, model_name, fn, retries=None, cancel=None):
+        """Run fn() under the guard and return its value, or raise LLMError.
+
+        ``retries`` overrides max_retries, e.g. 0 when a fallback model is
+        waiting and backing off would only add latency. Once the optional
+        ``cancel`` event is set (the caller stopped waiting), failures are
+        no longer retried.
+        """
+        max_retries = self.max_retries if retries is None else retries
+        self._count("calls")
+        attempt = 0
+        while True:
+            slots, breaker, bucket = self._admit(api_key, model_name)
+            try:
+                value = fn()
+            except Exception as e:
+                error = classify(e)
+                error.attempts = attempt + 1
+                self._failed(error, breaker, bucket)
+                if not is_retryable(error) or attempt >= max_retries or (cancel is not None and cancel.is_set()):
+                    raise error from e
+            else:
+                breaker.record_success()
+                bucket.reward()
+                return value
+            finally:
+                slots.release()
+            self._count("retries")
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def stream(self, api_key, model_name, start, retries=None, cancel=None):
+        """Yield chunks from the iterator returned by start().
+
+        Retries only happen before the first chunk (and while ``cancel`` is
+        unset); once text has been yielded a failure is raised, since the
+        partial output is already on screen. The concurrency slot is held
+        for the whole stream.
+        """
+        max_retries = self.max_retries if retries is None else retries
+        self._count("calls")
+        attempt = 0
+        while True:
+            slots, breaker, bucket = self._admit(api_key, model_name)
+            started = False
+            try:
+                for chunk in start():
+                    started = True
+                    yield chunk
+            except GeneratorExit:
+                breaker.record_cancel()
+                raise
+            except Exception as e:
+                error = classify(e)
+                error.attempts = attempt + 1
+                self._failed(error, breaker, bucket)
+                if (started or not is_retryable(error) or attempt >= max_retries
+                        or (cancel is not None and cancel.is_set())):
+                    raise error from e
+            else:
+                breaker.record_success()
+                bucket.reward()
+                return
+            finally:
+                slots.release()
+            self._count("retries")
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            breakers = dict(self._breakers)
+            stats["tracked_keys"] = len(self._buckets)
+        stats["circuits"] = {name: breaker.state for name, breaker in breakers.items()}
+        return stats
@@ -0,0 +1,177 @@
+"""Incremental revision of a generated cover letter.
+
+Instead of regenerating the whole letter after a small change, the new
+inputs are diffed against the previous generation:
+
+* paragraphs the user edited or added are polished in place, and
+* when the job description changed, the paragraphs that share the most
+  vocabulary with the added or removed sentences are updated.
+
+Each affected paragraph is sent to the model on its own, with only its
+neighbours as context, and the answers are spliced back into the letter.
+The added and removed job description sentences quoted in those prompts are
+compacted to ``CHANGE_TOKEN_BUDGET`` each, the way prompt_budget compacts a
+whole description, so one large edit can't blow up every prompt.
+"""
+import difflib
+import re
+
+from prompt_budget import PromptBudget, estimate_tokens, split_segments
+
+EDITED = "edited"
+JOB_CHANGED = "job_changed"
+
+# Neighbouring paragraphs are trimmed to this many characters of context
+CONTEXT_CHARS = 300
+# Estimated tokens of added (and, separately, removed) sentences quoted in a revision prompt
+CHANGE_TOKEN_BUDGET = 300
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_WORD_RE = re.compile(r"[a-z][a-z0-9+#.-]{3,}")
+
+# Frequent words that say nothing about which paragraph a change relates to
+STOPWORDS = frozenset(
+    "with that this from have will your their they them into about over more most such than then "
+    "also been were what when where which while would could should must able work working team "
+    "teams role experience years".split()
+)
+
+
+def split_paragraphs(text):
+    return [p.strip() for p in _PARAGRAPH_RE.split(text or "") if p.strip()]
+
+
+def _words(text):
+    return set(_WORD_RE.findall(text.lower())) - STOPWORDS
+
+
+def _is_frame(paragraph):
+    # Salutations and sign-offs ("Dear ...", "Sincerely, Name") are left alone
+    return len(paragraph) < 80
+
+
+def edited_paragraphs(previous_letter, letter):
+    """Indices of paragraphs in `letter` that were edited or added since `previous_letter`."""
+    old, new = split_paragraphs(previous_letter), split_paragraphs(letter)
+    matcher = difflib.SequenceMatcher(a=old, b=new, autojunk=False)
+    changed = []
+    for tag, _, _, j1, j2 in matcher.get_opcodes():
+        if tag in ("replace", "insert"):
+            changed.extend(i for i in range(j1, j2) if not _is_frame(new[i]))
+    return changed
+
+
+def job_description_changes(previous, current):
+    """Return (added, removed) sentences between two versions of a job description."""
+    old, new = split_segments(previous), split_segments(current)
+    matcher = difflib.SequenceMatcher(a=old, b=new, autojunk=False)
+    added, removed = [], []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ("replace", "delete"):
+            removed.extend(old[i1:i2])
+        if tag in ("replace", "insert"):
+            added.extend(new[j1:j2])
+    return added, removed
+
+
+def paragraphs_for_job_changes(paragraphs, added, removed, limit=2):
+    """Indices of the body paragraphs most related to the changed job description sentences."""
+    change_words = _words(" ".join(added + removed))
+    body = [i for i, p in enumerate(paragraphs) if not _is_frame(p)]
+    if not change_words or not body:
+        return []
+    scored = sorted(((len(_words(paragraphs[i]) & change_words), -i) for i in body), reverse=True)
+    best = scored[0][0]
+    # Only paragraphs about as related as the best one; a single shared word elsewhere isn't enough
+    picked = [-neg_index for score, neg_index in scored[:limit] if score > 0 and score * 2 > best]
+    if not picked and added:
+        # New requirements that no paragraph touches yet go into the middle of the body
+        picked = [body[len(body) // 2]]
+    return sorted(picked)
+
+
+def compact_changes(sentences, max_tokens=CHANGE_TOKEN_BUDGET):
+    """Return (sentences that fit max_tokens, number left out), kept in their original order."""
+    text, report = PromptBudget(max_tokens=max_tokens).compact("\n".join(sentences))
+    kept = split_segments(text) if report["tokens_before"] > max_tokens else list(sentences)
+    return kept, len(sentences) - len(kept)
+
+
+def build_revision_prompt(paragraphs, index, reason, tone, length, focus, added=(), removed=()):
+    """Prompt asking the model to rewrite paragraphs[index] only."""
+    before = paragraphs[index - 1][-CONTEXT_CHARS:] if index > 0 else "(start of letter)"
+    after = paragraphs[index + 1][:CONTEXT_CHARS] if index + 1 < len(paragraphs) else "(end of letter)"
+
+    if reason == EDITED:
+        task = (
+            "The candidate edited this paragraph. Keep their changes and intent; improve grammar and flow "
+            "and match the letter's tone."
+        )
+    else:
+        task = (
+            "The job description changed. Update this paragraph to address the changes where the "
+            "candidate's experience supports it. Do not invent experience."
+        )
+        for heading, sentences in (("New or changed in the job description", added),
+                                   ("No longer in the job description", removed)):
+            shown, left_out = compact_changes(sentences)
+            if shown:
+                task += f"\n{heading}:\n" + "\n".join(f"- {s}" for s in shown)
+            if left_out:
+                task += f"\n(and {left_out} less relevant sentences)"
+
+    return f"""
+        You are revising one paragraph of a cover letter.
+
+        Tone: {tone}
+        Length: {length}
+        Focus: {focus}
+
+        {task}
+
+        Previous paragraph (context only, do not repeat):
+        {before}
+
+        Paragraph to revise:
+        {paragraphs[index]}
+
+        Next paragraph (context only, do not repeat):
+        {after}
+
+        Return only the revised paragraph, without explanations or additional text.
+        """
+
+
+def plan_revision(previous, letter, job_description, tone, length, focus):
+    """Work out which paragraphs to revise and the prompts to send.
+
+    ``previous`` is the session record of the last generation (its
+    ``letter`` and ``job_description``). Returns a dict with the current
+    ``paragraphs`` and a list of ``targets`` ({"index", "reason",
+    "prompt"}), plus the estimated prompt tokens.
+    """
+    paragraphs = split_paragraphs(letter)
+    reasons = {i: EDITED for i in edited_paragraphs(previous["letter"], letter)}
+
+    added, removed = job_description_changes(previous["job_description"], job_description)
+    for i in paragraphs_for_job_changes(paragraphs, added, removed):
+        reasons.setdefault(i, JOB_CHANGED)
+
+    targets = [
+        {
+            "index": i,
+            "reason": reason,
+            "prompt": build_revision_prompt(paragraphs, i, reason, tone, length, focus, added, removed),
+        }
+        for i, reason in sorted(reasons.items())
+    ]
+    return {
+        "paragraphs": paragraphs,
+        "targets": targets,
+        "prompt_tokens": sum(estimate_tokens(t["prompt"]) for t in targets),
+    }
+
+
+def splice(paragraphs, revised):
+    """Replace paragraphs by index ({index: text}) and join the letter back together."""
+    return "\n\n".join(revised.get(i, p).strip() for i, p in enumerate(paragraphs))
@@ -0,0 +1,150 @@
+"""Production entry point: app2's Flask server under gunicorn.
+
+    python serve.py                        # or: gunicorn -c serve.py app2:server
+
+This file is both a launcher and a gunicorn config file. Settings come from
+the environment:
+
+    CLG_BIND                address to listen on (default 0.0.0.0:8050)
+    CLG_WORKER_CLASS        gthread (default), sync or gevent
+    CLG_WORKERS             worker processes (default 1, see below)
+    CLG_THREADS             threads per gthread worker (default 16 per CPU, at most 64)
+    CLG_WORKER_CONNECTIONS  concurrent connections per gevent worker (default 1000)
+    CLG_PRELOAD             import the app once in the master before forking (default 1)
+    CLG_DRAIN_TIMEOUT       seconds a stopping worker keeps serving while its
+                            generations finish (default 90)
+
+Generation jobs live in the worker process that queued them and the browser
+polls that worker for the result, so the defaults run one worker with many
+threads. Requests are short (the LLM wait happens on the job queue), so
+threads only have to cover the ones blocked on I/O. The thread count
+follows os.cpu_count(): 16 per CPU, the setting measured on one CPU in the
+README, capped at 64, where the tail already grew on that machine. More workers need every poll of a
+page to reach the worker that started its job.
+
+On SIGTERM a worker stops taking new generations, keeps answering polls
+until its in-flight generations finish (or CLG_DRAIN_TIMEOUT passes), gives
+the browsers a few more seconds to collect them, and then exits as usual.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+
+WORKER_CLASS = os.environ.get("CLG_WORKER_CLASS", "gthread")
+if WORKER_CLASS not in ("sync", "gthread", "gevent"):
+    raise SystemExit(f"CLG_WORKER_CLASS must be sync, gthread or gevent, not '{WORKER_CLASS}'")
+
+if WORKER_CLASS == "gevent":
+    # Patch before anything (the preloaded app included) creates threads, locks or sockets
+    from gevent import monkey
+
+    monkey.patch_all()
+
+DRAIN_TIMEOUT = int(os.environ.get("CLG_DRAIN_TIMEOUT", "90"))
+# Pollers ask every 500 ms; this covers a couple of ticks after the last job finishes
+COLLECT_GRACE = 2
+
+logger = logging.getLogger("gunicorn.error")
+
+# gunicorn settings (read when this file is passed with -c, and by main() below)
+bind = os.environ.get("CLG_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("CLG_WORKERS", "1"))
+threads = int(os.environ.get("CLG_THREADS", str(min(64, 16 * (os.cpu_count() or 1)))))
+worker_connections = int(os.environ.get("CLG_WORKER_CONNECTIONS", "1000"))
+worker_class = f"serve.Draining{WORKER_CLASS.capitalize()}Worker"
+preload_app = os.environ.get("CLG_PRELOAD", "1") == "1"
+# The arbiter kills workers that are still running after graceful_timeout
+graceful_timeout = DRAIN_TIMEOUT + COLLECT_GRACE + 10
+timeout = 60
+keepalive = 5
+accesslog = os.environ.get("CLG_ACCESS_LOG")
+
+
+def _draining(base):
+    class DrainingWorker(base):
+        """Finishes in-flight generations before the worker stops on SIGTERM."""
+
+        def handle_exit(self, sig, frame):
+            if getattr(self, "_draining", False):
+                return
+            self._draining = True
+            # Signal handlers mustn't block, and the worker has to keep serving polls meanwhile
+            threading.Thread(target=self._drain_then_exit, args=(sig, frame), daemon=True).start()
+
+        def _drain_then_exit(self, sig, frame):
+            import app2
+
+            started = time.time()
+            cancelled = app2.job_queue.drain(DRAIN_TIMEOUT)
+            logger.info("Worker %s drained generations in %.1fs (%d cancelled)",
+                        self.pid, time.time() - started, cancelled)
+            time.sleep(COLLECT_GRACE)
+            super().handle_exit(sig, frame)
+
+    DrainingWorker.__name__ = f"Draining{base.__name__}"
+    return DrainingWorker
+
+
+def __getattr__(name):
+    # gunicorn imports the worker class by dotted path; the gevent one can only exist once gevent is patched in
+    if name == "DrainingSyncWorker":
+        from gunicorn.workers.sync import SyncWorker
+        return _draining(SyncWorker)
+    if name == "DrainingGthreadWorker":
+        from gunicorn.workers.gthread import ThreadWorker
+        return _draining(ThreadWorker)
+    if name == "DrainingGeventWorker":
+        from gunicorn.workers.ggevent import GeventWorker
+        return _draining(GeventWorker)
+    raise AttributeError(name)
+
+
+# gunicorn server hooks
+
+def when_ready(server):
+    if preload_app:
+        import app2
+
+        # Workers inherit the SDK, PDF and HTML modules instead of importing them on first use
+        app2.prewarm()
+    if workers > 1:
+        server.log.warning(
+            "Running %d workers: generation jobs are tracked per worker, so polls that reach "
+            "another worker won't find them. Use one worker unless requests are pinned.", workers)
+    server.log.info("Serving with %d %s worker(s), %d thread(s)/%d connection(s) each",
+                    workers, WORKER_CLASS, threads, worker_connections)
+
+
+def post_fork(server, worker):
+    if "app2" in sys.modules:
+        sys.modules["app2"].after_fork()
+
+
+def main():
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit("serve.py needs gunicorn (pip install gunicorn; gevent for CLG_WORKER_CLASS=gevent)")
+
+    settings = {name: value for name, value in globals().items() if name in (
+        "bind", "workers", "threads", "worker_connections", "worker_class", "preload_app",
+        "graceful_timeout", "timeout", "keepalive", "accesslog", "when_ready", "post_fork",
+    )}
+
+    class Application(BaseApplication):
+        def load_config(self):
+            for name, value in settings.items():
+                self.cfg.set(name, value)
+
+        def load(self):
+            from app2 import server
+
+            return server
+
+    Application().run()
+
+
+if __name__ == "__main__":
+    main()
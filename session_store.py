@@ -0,0 +1,127 @@
+"""Server-side session data, so callbacks exchange an opaque id instead of blobs.
+
+Each page load gets a random session id (see ``serve_layout`` in app2). The
+API key, extracted PDF text and revision history are stored here under
+``<session id>:<field>``, and the browser only ever holds the id.
+
+Backends are chosen by URL:
+
+* ``memory`` (default): an in-process LRU bounded by entries and bytes,
+* ``sqlite:///path/to/sessions.db``: a SQLite file shared by the worker
+  processes on one host,
+* ``redis://host:6379/0``: any Redis-compatible server (Redis, Valkey,
+  KeyDB, ...), shared across hosts. Needs the optional ``redis`` package.
+
+Every backend expires a field ``ttl`` seconds after it was last read or
+written, so a saved API key lasts as long as the page keeps using it.
+"""
+import json
+import secrets
+import threading
+
+from cache import LRUCache, SQLiteCache, sizeof
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+_MISSING = object()
+
+
+class RedisBackend:
+    """Stores JSON values in a Redis-compatible server with a per-key expiry, renewed on read."""
+
+    def __init__(self, url, ttl, prefix="clg:session:"):
+        if redis is None:
+            raise RuntimeError("The redis session backend needs the 'redis' package (pip install redis)")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key, default=None):
+        # GET + EXPIRE rather than GETEX, which older Redis-compatible servers lack
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.get(self.prefix + key)
+        pipeline.expire(self.prefix + key, self.ttl)
+        value, _ = pipeline.execute()
+        return default if value is None else json.loads(value)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*", count=1000))
+
+    def memory_bytes(self):
+        # Some Redis-compatible servers and managed services disable INFO
+        try:
+            return self.client.info("memory").get("used_memory")
+        except redis.exceptions.ResponseError:
+            return None
+
+
+def open_backend(url=None, ttl=3600, max_entries=10000, max_bytes=64 * 1024 * 1024):
+    """Create a session backend from a ``memory``, ``sqlite:///...`` or ``redis://...`` URL."""
+    url = url or "memory"
+    if url == "memory":
+        return LRUCache(max_entries=max_entries, ttl=ttl, max_bytes=max_bytes, sliding=True)
+    if url.startswith("sqlite:///"):
+        return SQLiteCache(url[len("sqlite:///"):], ttl=ttl, max_entries=max_entries, max_bytes=max_bytes,
+                           sliding=True)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url, ttl)
+    raise ValueError(f"Unknown session store URL '{url}'; expected memory, sqlite:///<path> or redis://<host>")
+
+
+class SessionStore:
+    """Per-session fields on top of a key/value backend, with hit/miss and byte counters."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._stats = {"gets": 0, "misses": 0, "sets": 0, "bytes_written": 0}
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    @staticmethod
+    def new_id():
+        return secrets.token_urlsafe(24)
+
+    def get(self, session_id, field, default=None):
+        if not session_id:
+            return default
+        self._count("gets")
+        value = self.backend.get(f"{session_id}:{field}", _MISSING)
+        if value is _MISSING:
+            self._count("misses")
+            return default
+        return value
+
+    def set(self, session_id, field, value):
+        if not session_id:
+            raise ValueError("A session id is required")
+        self.backend.set(f"{session_id}:{field}", value)
+        self._count("sets")
+        self._count("bytes_written", sizeof(value))
+
+    def delete(self, session_id, field):
+        if session_id:
+            self.backend.delete(f"{session_id}:{field}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["backend"] = type(self.backend).__name__
+        stats["entries"] = len(self.backend)
+        if isinstance(self.backend, LRUCache):
+            stats["memory_bytes"] = self.backend.current_bytes
+            stats["max_bytes"] = self.backend.max_bytes
+        elif isinstance(self.backend, RedisBackend):
+            stats["server_memory_bytes"] = self.backend.memory_bytes()
+        return stats
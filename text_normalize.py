@@ -0,0 +1,142 @@
+"""Clean up text extracted from PDF pages without losing its layout.
+
+Every page is read once, line by line:
+
+- runs of spaces and tabs inside a line collapse to one space,
+- page numbers go (see below),
+- running headers and footers go (see below),
+- a word hyphenated at the end of a line is joined with its other half
+  when the next line starts in lower case,
+- wrapped lines are joined back into one line per paragraph, while short
+  lines (address blocks, "Sincerely,", list items) keep their line breaks,
+- blank lines become paragraph breaks, and pages are separated by one.
+
+Running headers and footers are found by comparing the first and last
+``EDGE_LINES`` lines of every page: a line that shows up in the same place
+on most pages (digits ignored, so "Jane Doe - 3" matches "Jane Doe - 4") is
+dropped everywhere it repeats.
+
+Page numbers are only looked for on the first and last non-blank line of a
+page. A "Page 3" or "Page 3 of 7" line there is dropped. A bare number
+("3", "- 3 -", "3/7") is dropped only if such lines sit in the same place
+on most pages and their numbers increase from page to page. A year, a
+figure or a count on a line of its own stays.
+"""
+import re
+
+# How many lines at the top and bottom of a page can hold a header or footer
+EDGE_LINES = 3
+# Share of pages a line must appear on to count as a header or footer
+REPEAT_SHARE = 0.6
+# A line shorter than this share of the page's longest line ends where it does
+WRAP_RATIO = 0.75
+# Lines shorter than this are never treated as wrapped, however narrow the page
+MIN_WRAP = 40
+
+PAGE_LABEL_RE = re.compile(r"page\s+\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?", re.IGNORECASE)
+PAGE_NUMBER_RE = re.compile(
+    r"(?:page\s+)?[-–—]?\s*\d{1,4}\s*(?:(?:of|/)\s*\d{1,4})?\s*[-–—]?",
+    re.IGNORECASE,
+)
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def _clean_lines(text):
+    return [" ".join(line.split()) for line in text.splitlines()]
+
+
+def _edge_keys(lines):
+    """(index, key) for the first and last EDGE_LINES non-blank lines of a page.
+
+    Keys mask digits and record whether the line is at the top or the bottom,
+    so a line heading one page and closing another doesn't count as repeated.
+    """
+    filled = [i for i, line in enumerate(lines) if line]
+    top = filled[:EDGE_LINES]
+    bottom = filled[EDGE_LINES:][-EDGE_LINES:]
+    return ([(i, (True, _DIGITS_RE.sub("#", lines[i].lower()))) for i in top]
+            + [(i, (False, _DIGITS_RE.sub("#", lines[i].lower()))) for i in bottom])
+
+
+def _repeated(edges):
+    """Keys found on at least REPEAT_SHARE of the pages (and on two or more).
+
+    Page-number shaped keys are left to _page_numbers, which also checks the numbers.
+    """
+    if len(edges) < 2:
+        return set()
+    counts = {}
+    for page_edges in edges:
+        for key in {key for _, key in page_edges}:
+            counts[key] = counts.get(key, 0) + 1
+    needed = max(2, REPEAT_SHARE * len(edges))
+    return {key for key, count in counts.items()
+            if count >= needed and not PAGE_NUMBER_RE.fullmatch(key[1].replace("#", "0"))}
+
+
+def _page_numbers(pages):
+    """Per page, the indices of its page-number lines (see the module docstring)."""
+    drop = [set() for _ in pages]
+    for edge in (0, -1):
+        bare = []
+        for page, lines in enumerate(pages):
+            filled = [i for i, line in enumerate(lines) if line]
+            if not filled:
+                continue
+            i = filled[edge]
+            if PAGE_LABEL_RE.fullmatch(lines[i]):
+                drop[page].add(i)
+            elif PAGE_NUMBER_RE.fullmatch(lines[i]):
+                bare.append((page, i, int(_DIGITS_RE.search(lines[i]).group())))
+        numbers = [number for _, _, number in bare]
+        if (len(bare) >= max(2, REPEAT_SHARE * len(pages))
+                and all(a < b for a, b in zip(numbers, numbers[1:]))):
+            for page, i, _ in bare:
+                drop[page].add(i)
+    return drop
+
+
+def _reflow(lines, drop):
+    """Join one page's wrapped lines; returns its output lines ("" marks a paragraph break)."""
+    longest = max((len(line) for line in lines), default=0)
+    wrap_at = max(MIN_WRAP, WRAP_RATIO * longest)
+    out = []
+    parts = []
+    for i, line in enumerate(lines):
+        if not line:
+            if parts:
+                out.append(" ".join(parts))
+                parts = []
+            if out and out[-1]:
+                out.append("")
+            continue
+        if i in drop:
+            continue
+        if parts and parts[-1][-1] == "-" and parts[-1][-2:-1].isalpha() and line[0].islower():
+            parts[-1] = parts[-1][:-1] + line
+        else:
+            parts.append(line)
+        hyphenated = line[-1] == "-" and line[-2:-1].isalpha()
+        if len(line) < wrap_at and not hyphenated:
+            out.append(" ".join(parts))
+            parts = []
+    if parts:
+        out.append(" ".join(parts))
+    while out and not out[-1]:
+        out.pop()
+    return out
+
+
+def normalize_pages(page_texts, strip_repeated=True):
+    """Normalise the text of each PDF page and join the pages into one string."""
+    pages = [_clean_lines(text) for text in page_texts]
+    edges = [_edge_keys(lines) for lines in pages] if strip_repeated else [[] for _ in pages]
+    repeated = _repeated(edges)
+    numbers = _page_numbers(pages)
+
+    blocks = []
+    for lines, page_edges, page_numbers in zip(pages, edges, numbers):
+        out = _reflow(lines, {i for i, key in page_edges if key in repeated} | page_numbers)
+        if out:
+            blocks.append("\n".join(out))
+    return "\n\n".join(blocks)
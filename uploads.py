@@ -0,0 +1,176 @@
+"""Streaming upload endpoint and the server-side store behind it.
+
+The browser posts the raw file bytes to ``<prefix>upload`` (see
+assets/uploads.js), where the prefix is the one Dash serves its own routes
+under. The body is copied in fixed-size chunks into a
+``SpooledTemporaryFile``, which stays in memory for small files and spills
+to disk for large ones. The size limit is enforced while copying, so an
+oversized upload is rejected without ever being held in full. Callbacks
+receive only the returned handle, never a base64 data URL.
+
+Each upload belongs to the session that posted it and is read once: the
+callback that extracts it takes it out of the store with its session id,
+and a handle from another session gets nothing. Uploads nobody consumes
+are closed after ``ttl`` seconds. Handles are local to the process that
+received the upload.
+"""
+import contextlib
+import hashlib
+import tempfile
+import threading
+import time
+import uuid
+
+from metrics import STAGE_SECONDS
+
+CHUNK_SIZE = 64 * 1024
+# The session id is the bearer token for the session's API key, so it stays out of
+# URLs (and access logs)
+SESSION_HEADER = "X-CLG-Session"
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the store's byte limit (or a validator's size limits)."""
+
+
+class Upload:
+    """A stored upload: its metadata and a spooled file holding the bytes."""
+
+    def __init__(self, handle, filename, content_type, fileobj, size, sha256, session_id=None):
+        self.handle = handle
+        self.session_id = session_id
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.sha256 = sha256
+        self.created = time.time()
+        self._file = fileobj
+        self._lock = threading.Lock()
+
+    def read(self):
+        """Return the full upload as bytes."""
+        with self._lock:
+            self._file.seek(0)
+            return self._file.read()
+
+    @contextlib.contextmanager
+    def open(self):
+        """The spooled file, rewound, for readers that seek instead of loading it whole."""
+        with self._lock:
+            self._file.seek(0)
+            yield self._file
+
+    def close(self):
+        self._file.close()
+
+    def info(self):
+        return {"handle": self.handle, "filename": self.filename, "size": self.size}
+
+
+class UploadStore:
+    """Process-local registry of spooled uploads with a size limit and TTL."""
+
+    def __init__(self, max_bytes=20 * 1024 * 1024, spool_bytes=1024 * 1024, ttl=900, directory=None):
+        self.max_bytes = max_bytes
+        self.spool_bytes = spool_bytes
+        self.ttl = ttl
+        self.directory = directory
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def save_stream(self, stream, filename, content_type=None, session_id=None):
+        """Copy a readable stream into a spooled buffer in chunks and return the Upload."""
+        spooled = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes, dir=self.directory)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise UploadTooLargeError(
+                        f"File is larger than the {self.max_bytes / 1048576:.0f} MB upload limit."
+                    )
+                digest.update(chunk)
+                spooled.write(chunk)
+        except Exception:
+            spooled.close()
+            raise
+
+        upload = Upload(uuid.uuid4().hex, filename, content_type, spooled, size, digest.hexdigest(), session_id)
+        with self._lock:
+            self._purge(time.time())
+            self._uploads[upload.handle] = upload
+        return upload
+
+    def get(self, handle):
+        with self._lock:
+            return self._uploads.get(handle)
+
+    def take(self, handle, session_id):
+        """Remove and return the session's upload; None if it is gone or belongs to another session.
+
+        The caller owns the returned Upload and closes it once it has been read.
+        """
+        with self._lock:
+            upload = self._uploads.get(handle)
+            if upload is None or upload.session_id != session_id:
+                return None
+            return self._uploads.pop(handle)
+
+    def discard(self, handle):
+        with self._lock:
+            upload = self._uploads.pop(handle, None)
+        if upload is not None:
+            upload.close()
+
+    def _purge(self, now):
+        for handle in [h for h, u in self._uploads.items() if now - u.created > self.ttl]:
+            self._uploads.pop(handle).close()
+
+
+def register_upload_route(server, store, validate=None, prefix="/"):
+    """Add ``POST <prefix>upload`` to a Flask server.
+
+    The body is the raw file (or a multipart form with a ``file`` field); the
+    filename comes from the ``filename`` query parameter and the owning
+    session id from the SESSION_HEADER header. ``validate`` is called with
+    the stored Upload and may raise UploadTooLargeError (answered with 413)
+    for size or page limits, or ValueError (400) for a file it can't read.
+    """
+    import flask
+
+    @server.route(f"{prefix}upload", methods=["POST"])
+    def upload_file():
+        request = flask.request
+        session_id = request.headers.get(SESSION_HEADER)
+        if not session_id:
+            return flask.jsonify(error=f"Missing '{SESSION_HEADER}' header"), 400
+        if request.content_length is not None and request.content_length > store.max_bytes:
+            return flask.jsonify(error=f"File is larger than the {store.max_bytes / 1048576:.0f} MB upload limit."), 413
+
+        if request.mimetype == "multipart/form-data":
+            part = request.files.get("file")
+            if part is None:
+                return flask.jsonify(error="Missing 'file' field"), 400
+            stream, filename, content_type = part.stream, part.filename, part.mimetype
+        else:
+            stream, filename, content_type = request.stream, request.args.get("filename", ""), request.mimetype
+
+        try:
+            with STAGE_SECONDS.time(stage="upload_receive"):
+                upload = store.save_stream(stream, filename, content_type, session_id)
+        except UploadTooLargeError as e:
+            return flask.jsonify(error=str(e)), 413
+
+        if validate is not None:
+            try:
+                validate(upload)
+            except ValueError as e:
+                store.discard(upload.handle)
+                return flask.jsonify(error=str(e)), 413 if isinstance(e, UploadTooLargeError) else 400
+        return flask.jsonify(upload.info())
+
+    return upload_file